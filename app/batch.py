@@ -0,0 +1,169 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from summarizer import summarize_texts, SUMMARY_BATCH_SIZE
+from pipeline import run_research_pipeline
+from utils import generate_rag_report
+from dedup import find_duplicate, remember
+from rate_limit import request_priority, PRIORITY_BATCH
+
+# 사용 예:
+#   python app/batch.py --input articles.jsonl --output results.jsonl --concurrency 4
+#   cat articles.jsonl | python app/batch.py --output results.jsonl
+# 입력 한 줄: {"request_id": ..., "title": ..., "body": ...} (id/text 필드도 허용)
+
+ID_FIELDS = ("request_id", "id")
+TEXT_FIELDS = ("body", "text", "content")
+
+def parse_article(line, line_number):
+    record = json.loads(line)
+    article_id = next((str(record[field]) for field in ID_FIELDS if record.get(field) is not None), str(line_number))
+    text = next((record[field] for field in TEXT_FIELDS if record.get(field)), "")
+    if record.get("title"):
+        text = f"{record['title']}\n{text}"
+    return article_id, text
+
+def iter_articles(stream):
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield parse_article(line, line_number)
+        except (ValueError, TypeError) as e:
+            logging.error(f"Skipping invalid input line {line_number}: {str(e)}")
+
+def load_checkpoint(path):
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path, encoding='utf-8') as f:
+        return {line.strip() for line in f if line.strip()}
+
+class ResultWriter:
+    # 기사별 결과를 완료되는 즉시 출력하고, 출력이 기록된 뒤에 체크포인트에 id를 남김
+    def __init__(self, output, checkpoint_path):
+        self.output = output
+        self.checkpoint = open(checkpoint_path, 'a', encoding='utf-8') if checkpoint_path else None
+        self.lock = threading.Lock()
+        self.completed = 0
+        self.failed = 0
+
+    def write(self, article_id, result):
+        line = json.dumps({"id": article_id, **result}, ensure_ascii=False)
+        with self.lock:
+            self.output.write(line + "\n")
+            self.output.flush()
+            if "error" in result:
+                # 실패한 기사는 체크포인트에 남기지 않아 재실행 시 다시 처리됨
+                self.failed += 1
+                return
+            self.completed += 1
+            if self.checkpoint:
+                self.checkpoint.write(article_id + "\n")
+                self.checkpoint.flush()
+
+    def close(self):
+        if self.checkpoint:
+            self.checkpoint.close()
+
+def process_article(summary, rag):
+    if not summary:
+        return {"error": "요약 생성에 실패했습니다."}
+    result = run_research_pipeline(summary)
+    if "error" in result:
+        return result
+    if rag and result["steep_classification"] != 'economic':
+        try:
+            result["rag_report"] = generate_rag_report(summary)
+        except Exception as e:
+            result["rag_error"] = str(e)
+    return result
+
+def run_batch(articles, writer, concurrency=4, batch_size=SUMMARY_BATCH_SIZE, rag=False, completed_ids=frozenset()):
+    # 요약은 배치 단위로 실행하고, 이후 네트워크 단계는 스레드 풀에서 동시에 처리
+    # 진행 중인 기사 수를 제한해 입력이 커도 메모리 사용량이 일정하도록 함
+    in_flight = threading.BoundedSemaphore(concurrency * 2)
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch")
+
+    def finish(article_id, text, summary):
+        try:
+            # 일괄 처리 요청은 화면에서 들어온 요청에 API 한도를 양보
+            with request_priority(PRIORITY_BATCH):
+                result = process_article(summary, rag)
+            remember(text, result)
+            writer.write(article_id, result)
+        except Exception as e:
+            logging.error(f"Error processing article {article_id}: {str(e)}")
+            writer.write(article_id, {"error": str(e)})
+        finally:
+            in_flight.release()
+
+    def flush(pending):
+        try:
+            summaries = summarize_texts([text for _, text in pending], batch_size)
+        except Exception as e:
+            logging.error(f"Error in batch summarization: {str(e)}")
+            summaries = [None] * len(pending)
+        for (article_id, text), summary in zip(pending, summaries):
+            in_flight.acquire()
+            executor.submit(finish, article_id, text, summary)
+
+    pending = []
+    skipped = 0
+    for article_id, text in articles:
+        if article_id in completed_ids:
+            skipped += 1
+            continue
+        # 통신사 기사처럼 거의 같은 기사를 이미 처리했다면 요약/파이프라인 없이 이전 결과를 재사용
+        duplicate = find_duplicate(text)
+        if duplicate is not None:
+            writer.write(article_id, duplicate)
+            continue
+        pending.append((article_id, text))
+        if len(pending) >= batch_size:
+            flush(pending)
+            pending = []
+    if pending:
+        flush(pending)
+    executor.shutdown(wait=True)
+    return skipped
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="기사 JSONL을 요약 -> 분류 -> 검색 -> 분석 파이프라인으로 일괄 처리")
+    parser.add_argument("--input", default="-", help="입력 JSONL 경로 (기본값: 표준 입력)")
+    parser.add_argument("--output", default="-", help="결과 JSONL 경로 (기본값: 표준 출력)")
+    parser.add_argument("--checkpoint", help="완료된 기사 id 기록 파일 (기본값: <output>.checkpoint)")
+    parser.add_argument("--concurrency", type=int, default=4, help="동시에 처리할 기사 수")
+    parser.add_argument("--batch-size", type=int, default=SUMMARY_BATCH_SIZE, help="요약 배치 크기")
+    parser.add_argument("--rag", action="store_true", help="경제 분야가 아닌 기사에 RAG 보고서 생성")
+    args = parser.parse_args(argv)
+
+    checkpoint_path = args.checkpoint or (f"{args.output}.checkpoint" if args.output != "-" else None)
+    completed_ids = load_checkpoint(checkpoint_path)
+
+    input_stream = sys.stdin if args.input == "-" else open(args.input, encoding='utf-8')
+    output_stream = sys.stdout if args.output == "-" else open(args.output, 'a', encoding='utf-8')
+    writer = ResultWriter(output_stream, checkpoint_path)
+    started = time.perf_counter()
+    try:
+        skipped = run_batch(iter_articles(input_stream), writer, args.concurrency, args.batch_size, args.rag, completed_ids)
+    finally:
+        writer.close()
+        if input_stream is not sys.stdin:
+            input_stream.close()
+        if output_stream is not sys.stdout:
+            output_stream.close()
+    print(
+        f"completed={writer.completed} failed={writer.failed} skipped={skipped} "
+        f"elapsed={time.perf_counter() - started:.1f}s",
+        file=sys.stderr
+    )
+    return 1 if writer.failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
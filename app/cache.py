@@ -0,0 +1,125 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from sqlite_store import SqliteStore
+
+RESPONSE_CACHE_PATH = os.getenv('RESPONSE_CACHE_PATH', 'db/response_cache.sqlite3')
+MEMORY_CACHE_SIZE = int(os.getenv('MEMORY_CACHE_SIZE', '512'))
+DISK_CACHE_SIZE = int(os.getenv('DISK_CACHE_SIZE', '20000'))
+SEARCH_CACHE_TTL = float(os.getenv('SEARCH_CACHE_TTL', str(6 * 60 * 60)))
+RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', '1') != '0'
+
+def make_key(*parts):
+    # 입력값을 정규화된 JSON으로 직렬화한 뒤 해시하여 내용 기반 키 생성
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class TieredCache(SqliteStore):
+    # 메모리 LRU(1차) + SQLite(2차) 캐시
+    def __init__(self, path, memory_size=MEMORY_CACHE_SIZE, disk_size=DISK_CACHE_SIZE, enabled=True):
+        super().__init__(path, (
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL, accessed_at REAL NOT NULL)",
+            "CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)"
+        ))
+        self.enabled = enabled
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self.memory = OrderedDict()
+        self.hits = 0
+        self.memory_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        if not self.enabled:
+            return default
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > now:
+                    self.memory.move_to_end(key)
+                    self.hits += 1
+                    self.memory_hits += 1
+                    return value
+                del self.memory[key]
+            try:
+                row = self.conn.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+                if row is None or (row[1] is not None and row[1] <= now):
+                    self.misses += 1
+                    return default
+                self.conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+                self.conn.commit()
+                value = pickle.loads(row[0])
+            except (sqlite3.Error, pickle.UnpicklingError) as e:
+                logging.error(f"Error in cache get: {str(e)}")
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._remember(key, value, row[1])
+            return value
+
+    def set(self, key, value, ttl=None):
+        if not self.enabled:
+            return
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        with self.lock:
+            self._remember(key, value, expires_at)
+            try:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, pickle.dumps(value), expires_at, now)
+                )
+                self.conn.commit()
+                self.wrote()
+            except sqlite3.Error as e:
+                logging.error(f"Error in cache set: {str(e)}")
+
+    def _remember(self, key, value, expires_at):
+        self.memory[key] = (value, expires_at)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+
+    def evict(self):
+        expired = self.conn.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)).rowcount
+        overflow = self.evict_least_recent("cache", "key", self.disk_size)
+        self.conn.commit()
+        self.evictions += expired + overflow
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            self.conn.execute("DELETE FROM cache")
+            self.conn.commit()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "memory_hits": self.memory_hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+                "evictions": self.evictions,
+                "memory_entries": len(self.memory)
+            }
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+def get_response_cache():
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = TieredCache(RESPONSE_CACHE_PATH, enabled=RESPONSE_CACHE_ENABLED)
+        return _response_cache
@@ -0,0 +1,87 @@
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+CHART_POINT_BUDGET = int(os.getenv('CHART_POINT_BUDGET', '500'))
+CHART_CACHE_SIZE = int(os.getenv('CHART_CACHE_SIZE', '256'))
+
+# 구간별 조회 기간과 거래량 최소 집계 단위 (None이면 일별 그대로)
+CHART_RANGES = {
+    "1M": (pd.DateOffset(months=1), None),
+    "1Y": (pd.DateOffset(years=1), None),
+    "5Y": (pd.DateOffset(years=5), "W"),
+    "max": (None, "ME")
+}
+# 막대 수가 예산을 넘으면 이 순서로 집계 단위를 키움
+VOLUME_RESAMPLE_RULES = (None, "W", "ME", "QE", "YE")
+
+_chart_cache = OrderedDict()
+_chart_cache_lock = threading.Lock()
+
+def lttb(x, y, threshold):
+    # Largest-Triangle-Three-Buckets: 모양을 유지하며 threshold개 점으로 줄인 인덱스 반환
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    bucket_size = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        next_start = end
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        areas = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
+
+def slice_range(history, chart_range):
+    offset, _ = CHART_RANGES[chart_range]
+    if offset is None or history.empty:
+        return history
+    return history[history.index >= history.index.max() - offset]
+
+def downsample_price(close, budget=CHART_POINT_BUDGET):
+    close = close.dropna()
+    if len(close) <= budget:
+        return close
+    x = close.index.asi8.astype(np.float64)
+    indices = lttb(x, close.to_numpy(dtype=np.float64), budget)
+    return close.iloc[indices]
+
+def aggregate_volume(volume, chart_range, budget=CHART_POINT_BUDGET):
+    # 상장 기간이 길어도 막대 수가 budget을 넘지 않도록 기간에 맞춰 집계 단위 선택
+    _, base_rule = CHART_RANGES[chart_range]
+    aggregated = volume
+    for rule in VOLUME_RESAMPLE_RULES[VOLUME_RESAMPLE_RULES.index(base_rule):]:
+        aggregated = volume if rule is None else volume.resample(rule).sum()
+        if len(aggregated) <= budget:
+            break
+    return aggregated
+
+def prepare_chart_data(ticker, history, chart_range, budget=CHART_POINT_BUDGET):
+    # 같은 종목/구간/데이터 상태에 대해서는 계산 결과를 재사용
+    cache_key = (ticker, chart_range, budget, len(history), history.index.max() if not history.empty else None)
+    with _chart_cache_lock:
+        if cache_key in _chart_cache:
+            _chart_cache.move_to_end(cache_key)
+            return _chart_cache[cache_key]
+
+    sliced = slice_range(history, chart_range)
+    chart_data = {
+        "close": downsample_price(sliced['Close'], budget),
+        "volume": aggregate_volume(sliced['Volume'], chart_range, budget)
+    }
+
+    with _chart_cache_lock:
+        _chart_cache[cache_key] = chart_data
+        while len(_chart_cache) > CHART_CACHE_SIZE:
+            _chart_cache.popitem(last=False)
+    return chart_data
@@ -0,0 +1,157 @@
+import hashlib
+import logging
+import os
+import pickle
+import re
+import sqlite3
+import time
+import numpy as np
+from resources import get_resource
+from sqlite_store import SqliteStore
+from tracing import stage
+
+DEDUP_ENABLED = os.getenv('DEDUP_ENABLED', '1') != '0'
+DEDUP_INDEX_PATH = os.getenv('DEDUP_INDEX_PATH', 'db/dedup_index.sqlite3')
+# 추정 자카드 유사도가 이 값 이상이면 같은 기사로 보고 이전 결과를 재사용
+DEDUP_THRESHOLD = float(os.getenv('DEDUP_THRESHOLD', '0.8'))
+DEDUP_MAX_ENTRIES = int(os.getenv('DEDUP_MAX_ENTRIES', '50000'))
+# 한국어는 어절 변화가 많아 단어 대신 문자 n-gram을 shingle로 사용
+SHINGLE_SIZE = int(os.getenv('DEDUP_SHINGLE_SIZE', '5'))
+# bands * rows = 순열 수. 16 x 8이면 후보가 되는 유사도 기준이 약 0.7
+LSH_BANDS = 16
+LSH_ROWS = 8
+NUM_PERM = LSH_BANDS * LSH_ROWS
+
+# 재사용할 파이프라인 결과 필드 (실행 시간 등 실행별 정보는 제외)
+RESULT_FIELDS = (
+    "summary", "steep_classification", "search_query", "search_queries", "google_scholar_content", "naver_news_content",
+    "combined_content", "analysis", "keywords", "ticker", "ticker_error"
+)
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+# 인덱스를 다시 열어도 같은 서명이 나오도록 고정된 시드로 순열 계수 생성
+_rng = np.random.RandomState(1)
+PERM_A = _rng.randint(1, int(MERSENNE_PRIME), size=NUM_PERM, dtype=np.uint64)
+PERM_B = _rng.randint(0, int(MERSENNE_PRIME), size=NUM_PERM, dtype=np.uint64)
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+def shingles(text, size=SHINGLE_SIZE):
+    text = WHITESPACE_PATTERN.sub(' ', text).strip().lower()
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+def minhash_signature(text):
+    grams = shingles(text)
+    if not grams:
+        return None
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(gram.encode('utf-8'), digest_size=4).digest(), 'little') for gram in grams),
+        dtype=np.uint64, count=len(grams)
+    )
+    # (a*h + b) mod p 순열을 모든 shingle에 한꺼번에 적용한 뒤 순열별 최솟값
+    permuted = np.bitwise_and((np.outer(hashes, PERM_A) + PERM_B) % MERSENNE_PRIME, MAX_HASH)
+    return permuted.min(axis=0).astype(np.uint32)
+
+def band_keys(signature):
+    return [
+        (band, hashlib.blake2b(signature[band * LSH_ROWS:(band + 1) * LSH_ROWS].tobytes(), digest_size=8).hexdigest())
+        for band in range(LSH_BANDS)
+    ]
+
+class DedupIndex(SqliteStore):
+    # MinHash 서명을 LSH 밴드로 색인해 비슷한 기사를 찾는 SQLite 저장소
+    def __init__(self, path, threshold=DEDUP_THRESHOLD, max_entries=DEDUP_MAX_ENTRIES):
+        super().__init__(path, (
+            "CREATE TABLE IF NOT EXISTS articles ("
+            "id INTEGER PRIMARY KEY, text_hash TEXT UNIQUE NOT NULL, signature BLOB NOT NULL, "
+            "result BLOB NOT NULL, accessed_at REAL NOT NULL)",
+            "CREATE TABLE IF NOT EXISTS bands (band INTEGER NOT NULL, bucket TEXT NOT NULL, article_id INTEGER NOT NULL)",
+            "CREATE INDEX IF NOT EXISTS bands_bucket ON bands (band, bucket)",
+            "CREATE INDEX IF NOT EXISTS bands_article ON bands (article_id)",
+            "CREATE INDEX IF NOT EXISTS articles_accessed_at ON articles (accessed_at)"
+        ))
+        self.threshold = threshold
+        self.max_entries = max_entries
+
+    def find(self, text):
+        # (저장된 결과, 추정 유사도) 또는 None
+        signature = minhash_signature(text)
+        if signature is None:
+            return None
+        keys = band_keys(signature)
+        with self.lock:
+            candidates = set()
+            for band, bucket in keys:
+                candidates.update(row[0] for row in self.conn.execute(
+                    "SELECT article_id FROM bands WHERE band = ? AND bucket = ?", (band, bucket)
+                ))
+            best = None
+            for article_id in candidates:
+                row = self.conn.execute("SELECT signature, result FROM articles WHERE id = ?", (article_id,)).fetchone()
+                if row is None:
+                    continue
+                similarity = float(np.mean(np.frombuffer(row[0], dtype=np.uint32) == signature))
+                if similarity >= self.threshold and (best is None or similarity > best[2]):
+                    best = (article_id, row[1], similarity)
+            if best is None:
+                return None
+            self.conn.execute("UPDATE articles SET accessed_at = ? WHERE id = ?", (time.time(), best[0]))
+            self.conn.commit()
+        return pickle.loads(best[1]), best[2]
+
+    def add(self, text, result):
+        signature = minhash_signature(text)
+        if signature is None:
+            return
+        text_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        with self.lock:
+            try:
+                cursor = self.conn.execute(
+                    "INSERT OR IGNORE INTO articles (text_hash, signature, result, accessed_at) VALUES (?, ?, ?, ?)",
+                    (text_hash, signature.tobytes(), pickle.dumps(result), time.time())
+                )
+                if cursor.rowcount:
+                    self.conn.executemany(
+                        "INSERT INTO bands (band, bucket, article_id) VALUES (?, ?, ?)",
+                        [(band, bucket, cursor.lastrowid) for band, bucket in band_keys(signature)]
+                    )
+                self.conn.commit()
+                self.wrote()
+            except sqlite3.Error as e:
+                logging.error(f"Error in dedup add: {str(e)}")
+
+    def evict(self):
+        # 가장 오래 재사용되지 않은 기사부터 밴드와 함께 제거
+        if self.evict_least_recent("articles", "id", self.max_entries, dependents=(("bands", "article_id"),)):
+            self.conn.commit()
+
+def get_dedup_index():
+    return get_resource("dedup_index", lambda: DedupIndex(DEDUP_INDEX_PATH))
+
+def find_duplicate(text):
+    # 이전에 처리한 거의 같은 기사의 결과가 있으면 그 사본을 반환
+    if not DEDUP_ENABLED or not text:
+        return None
+    with stage("dedup_lookup", chars=len(text)) as trace:
+        try:
+            match = get_dedup_index().find(text)
+        except Exception as e:
+            logging.error(f"Error in find_duplicate: {str(e)}")
+            match = None
+        trace["hit"] = match is not None
+        if match is None:
+            return None
+        result, similarity = match
+        trace["similarity"] = round(similarity, 3)
+    return dict(result, duplicate=True, similarity=round(similarity, 3))
+
+def remember(text, result):
+    if not DEDUP_ENABLED or not text or "error" in result or result.get("duplicate"):
+        return
+    try:
+        get_dedup_index().add(text, {field: result.get(field) for field in RESULT_FIELDS})
+    except Exception as e:
+        logging.error(f"Error in remember: {str(e)}")
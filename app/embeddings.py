@@ -0,0 +1,108 @@
+import hashlib
+import logging
+import os
+import threading
+import numpy as np
+from sqlite_store import SqliteStore
+
+# 기존 컬렉션은 Chroma 기본 임베딩(all-MiniLM-L6-v2)으로 저장되어 있음
+DEFAULT_EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', DEFAULT_EMBEDDING_MODEL)
+EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', '64'))
+EMBEDDING_CACHE_PATH = os.getenv('EMBEDDING_CACHE_PATH', 'db/embedding_cache.sqlite3')
+REEMBED_BATCH_SIZE = int(os.getenv('REEMBED_BATCH_SIZE', '256'))
+EMBEDDING_MODEL_KEY = "embedding_model"
+
+def content_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+class EmbeddingStore(SqliteStore):
+    # (모델, 내용 해시) -> float32 벡터를 저장하는 SQLite 저장소
+    def __init__(self, path):
+        super().__init__(path, (
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, hash TEXT NOT NULL, vector BLOB NOT NULL, PRIMARY KEY (model, hash))",
+        ))
+
+    def get_many(self, model, hashes):
+        found = {}
+        with self.lock:
+            # SQLite 변수 개수 제한을 넘지 않도록 나눠서 조회
+            for start in range(0, len(hashes), 500):
+                part = hashes[start:start + 500]
+                rows = self.conn.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({','.join('?' * len(part))})",
+                    (model, *part)
+                ).fetchall()
+                for digest, vector in rows:
+                    found[digest] = np.frombuffer(vector, dtype=np.float32)
+        return found
+
+    def put_many(self, model, items):
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, hash, vector) VALUES (?, ?, ?)",
+                [(model, digest, np.asarray(vector, dtype=np.float32).tobytes()) for digest, vector in items]
+            )
+            self.conn.commit()
+
+class CachedEmbeddingFunction:
+    # Chroma embedding_function 인터페이스: 텍스트 목록 -> 벡터 목록
+    def __init__(self, model_name, store, load_model, batch_size=EMBEDDING_BATCH_SIZE):
+        self.model_name = model_name
+        self.store = store
+        self.load_model = load_model
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(self, texts):
+        hashes = [content_hash(text) for text in texts]
+        vectors = self.store.get_many(self.model_name, list(set(hashes)))
+        missing = {}
+        for digest, text in zip(hashes, texts):
+            if digest not in vectors:
+                missing.setdefault(digest, text)
+        with self.lock:
+            self.hits += len(hashes) - sum(1 for digest in hashes if digest in missing)
+            self.misses += len(missing)
+        if missing:
+            # 캐시에 없는 고유 텍스트만 배치로 인코딩
+            encoded = self.load_model().encode(
+                list(missing.values()),
+                batch_size=self.batch_size,
+                convert_to_numpy=True,
+                normalize_embeddings=False
+            )
+            new_items = list(zip(missing.keys(), encoded))
+            self.store.put_many(self.model_name, new_items)
+            vectors.update({digest: np.asarray(vector, dtype=np.float32) for digest, vector in new_items})
+        return [vectors[digest].tolist() for digest in hashes]
+
+    def stats(self):
+        with self.lock:
+            return {"model": self.model_name, "hits": self.hits, "misses": self.misses}
+
+def reembed_collection(collection, embedding_function, batch_size=REEMBED_BATCH_SIZE):
+    # 컬렉션에 기록된 임베딩 모델이 다르면 모든 문서를 새 모델로 다시 임베딩
+    recorded = (collection.metadata or {}).get(EMBEDDING_MODEL_KEY)
+    if recorded == embedding_function.model_name:
+        return 0
+    if recorded is None and embedding_function.model_name == DEFAULT_EMBEDDING_MODEL:
+        # 모델 기록이 없는 기존 컬렉션은 Chroma 기본 모델로 만들어졌으므로 기록만 남김
+        collection.modify(metadata={**(collection.metadata or {}), EMBEDDING_MODEL_KEY: embedding_function.model_name})
+        return 0
+
+    logging.warning(f"Re-embedding collection {collection.name}: {recorded} -> {embedding_function.model_name}")
+    total = collection.count()
+    updated = 0
+    for offset in range(0, total, batch_size):
+        page = collection.get(limit=batch_size, offset=offset, include=["documents"])
+        if not page['ids']:
+            break
+        collection.update(ids=page['ids'], documents=page['documents'])
+        updated += len(page['ids'])
+    # 모든 문서를 갱신한 뒤에 기록하여 중간에 실패하면 다음 시작 때 다시 수행
+    collection.modify(metadata={**(collection.metadata or {}), EMBEDDING_MODEL_KEY: embedding_function.model_name})
+    return updated
@@ -0,0 +1,192 @@
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+import httpx
+from rate_limit import retry_after_seconds
+
+# HTTP/2는 h2 패키지가 설치된 경우에만 사용
+try:
+    import h2  # noqa: F401
+    HTTP2_ENABLED = True
+except ImportError:
+    HTTP2_ENABLED = False
+
+MAX_CONNECTIONS_PER_HOST = int(os.getenv('HTTP_MAX_CONNECTIONS_PER_HOST', '8'))
+KEEPALIVE_EXPIRY = float(os.getenv('HTTP_KEEPALIVE_EXPIRY', '60'))
+MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', '3'))
+BACKOFF_BASE = float(os.getenv('HTTP_BACKOFF_BASE', '0.5'))
+BACKOFF_MAX = float(os.getenv('HTTP_BACKOFF_MAX', '8'))
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+# 응답 대기 시간 초과는 재시도하지 않음 (요청당 최대 지연이 timeout 배수로 늘어나는 것을 방지)
+RETRY_EXCEPTIONS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout, httpx.ReadError, httpx.RemoteProtocolError)
+
+class HostPool:
+    def __init__(self, host, max_connections):
+        self.host = host
+        self.client = httpx.Client(
+            http2=HTTP2_ENABLED,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=KEEPALIVE_EXPIRY
+            )
+        )
+        # 호스트별 동시 요청 수 제한
+        self.semaphore = threading.BoundedSemaphore(max_connections)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+        self.retries = 0
+        self.failures = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    def _trace(self, event_name, info):
+        # httpcore trace 이벤트로 새 연결 수를 집계 (나머지 요청은 keep-alive 재사용)
+        if event_name == "connection.connect_tcp.complete":
+            with self.lock:
+                self.new_connections += 1
+
+    @contextmanager
+    def slot(self):
+        wait_started = time.monotonic()
+        with self.semaphore:
+            waited = time.monotonic() - wait_started
+            with self.lock:
+                self.requests += 1
+                self.total_wait_time += waited
+                self.max_wait_time = max(self.max_wait_time, waited)
+            yield
+
+    def send(self, method, url, timeout, **kwargs):
+        with self.slot():
+            return self.client.request(method, url, timeout=timeout, extensions={"trace": self._trace}, **kwargs)
+
+    def stats(self):
+        with self.lock:
+            requests = self.requests
+            return {
+                "requests": requests,
+                "new_connections": self.new_connections,
+                "reuse_ratio": round(1 - self.new_connections / requests, 3) if requests else None,
+                "retries": self.retries,
+                "failures": self.failures,
+                "avg_wait_time": round(self.total_wait_time / requests, 4) if requests else 0.0,
+                "max_wait_time": round(self.max_wait_time, 4),
+                "http2": HTTP2_ENABLED
+            }
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(url):
+    host = urlsplit(url).netloc
+    with _pools_lock:
+        pool = _pools.get(host)
+        if pool is None:
+            pool = HostPool(host, MAX_CONNECTIONS_PER_HOST)
+            _pools[host] = pool
+        return pool
+
+def backoff_delay(attempt):
+    # full jitter: 0 ~ min(max, base * 2^attempt) 사이 임의 대기
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+def retry_delay(attempt, response=None, limiter=None):
+    # Retry-After가 있으면 그만큼 (제공자 전체를) 멈추고, 없으면 지수 백오프
+    delay = retry_after_seconds(response.headers) if response is not None else None
+    if delay is None:
+        return backoff_delay(attempt)
+    if limiter is not None:
+        limiter.pause(delay)
+    return delay
+
+def attempt_cost(cost, attempt):
+    # 토큰 등 예상 사용량은 첫 시도에서 한 번만 차감하고 (호출자가 실제 사용량으로 한 번 정산) 재시도는 요청 수만 차감
+    if attempt == 0 and cost:
+        return cost
+    return {"requests": 1}
+
+def request(method, url, timeout=100, limiter=None, cost=None, **kwargs):
+    # limiter가 있으면 보내기 전에 제공자 한도(cost: 버킷별 차감량)를 확보
+    pool = get_pool(url)
+    for attempt in range(MAX_RETRIES + 1):
+        last_attempt = attempt == MAX_RETRIES
+        response = None
+        if limiter is not None:
+            limiter.acquire(**attempt_cost(cost, attempt))
+        try:
+            response = pool.send(method, url, timeout, **kwargs)
+        except RETRY_EXCEPTIONS as e:
+            if last_attempt:
+                with pool.lock:
+                    pool.failures += 1
+                raise
+            logging.warning(f"Retrying {method} {pool.host} after {type(e).__name__} (attempt {attempt + 1})")
+        else:
+            if response.status_code not in RETRY_STATUS_CODES:
+                return response
+            if last_attempt:
+                with pool.lock:
+                    pool.failures += 1
+                return response
+            logging.warning(f"Retrying {method} {pool.host} after HTTP {response.status_code} (attempt {attempt + 1})")
+        with pool.lock:
+            pool.retries += 1
+        time.sleep(retry_delay(attempt, response, limiter))
+
+@contextmanager
+def stream(method, url, timeout=100, limiter=None, cost=None, **kwargs):
+    # 스트리밍 응답: 첫 응답을 받기 전까지만 재시도하고, 본문을 읽는 동안 호스트 슬롯을 점유
+    pool = get_pool(url)
+    for attempt in range(MAX_RETRIES + 1):
+        last_attempt = attempt == MAX_RETRIES
+        yielded = False
+        retry_response = None
+        if limiter is not None:
+            limiter.acquire(**attempt_cost(cost, attempt))
+        with pool.slot():
+            try:
+                with pool.client.stream(method, url, timeout=timeout, extensions={"trace": pool._trace}, **kwargs) as response:
+                    if response.status_code not in RETRY_STATUS_CODES or last_attempt:
+                        if response.status_code in RETRY_STATUS_CODES:
+                            with pool.lock:
+                                pool.failures += 1
+                        yielded = True
+                        yield response
+                        return
+                    logging.warning(f"Retrying {method} {pool.host} after HTTP {response.status_code} (attempt {attempt + 1})")
+                    retry_response = response
+            except RETRY_EXCEPTIONS as e:
+                # 이미 호출자에게 넘긴 응답을 읽다 난 오류는 재시도하지 않음
+                if yielded or last_attempt:
+                    with pool.lock:
+                        pool.failures += 1
+                    raise
+                logging.warning(f"Retrying {method} {pool.host} after {type(e).__name__} (attempt {attempt + 1})")
+        with pool.lock:
+            pool.retries += 1
+        time.sleep(retry_delay(attempt, retry_response, limiter))
+
+def get(url, params=None, headers=None, timeout=100, limiter=None, cost=None):
+    return request("GET", url, params=params, headers=headers, timeout=timeout, limiter=limiter, cost=cost)
+
+def post(url, json=None, headers=None, timeout=100, limiter=None, cost=None):
+    return request("POST", url, json=json, headers=headers, timeout=timeout, limiter=limiter, cost=cost)
+
+def pool_stats():
+    with _pools_lock:
+        pools = list(_pools.values())
+    return {pool.host: pool.stats() for pool in pools}
+
+def close_all():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.client.close()
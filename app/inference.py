@@ -0,0 +1,270 @@
+import difflib
+import logging
+import os
+import time
+import numpy as np
+
+SUMMARIZER_BACKEND = os.getenv('SUMMARIZER_BACKEND', 'torch')
+SUMMARIZER_ONNX_DIR = os.getenv('SUMMARIZER_ONNX_DIR', 'db/onnx/')
+ORT_NUM_THREADS = int(os.getenv('ORT_NUM_THREADS', '0'))
+GENERATE_KWARGS = dict(max_length=150, min_length=40, length_penalty=2.0, num_beams=4, early_stopping=True)
+
+# 요약 모델 추론 백엔드
+#   torch       : PyTorch fp32 (기존 동작)
+#   torch-int8  : PyTorch 동적 int8 양자화 (Linear 계층)
+#   onnx        : ONNX Runtime 인코더/디코더 + KV 캐시 빔 서치
+
+class TorchBackend:
+    def __init__(self, model, pad_token_id, name='torch'):
+        self.model = model
+        self.pad_token_id = pad_token_id
+        self.name = name
+
+    def generate(self, batch_input_ids):
+        import torch
+        max_len = max(len(ids) for ids in batch_input_ids)
+        input_ids = torch.full((len(batch_input_ids), max_len), self.pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(batch_input_ids), max_len), dtype=torch.long)
+        for i, ids in enumerate(batch_input_ids):
+            input_ids[i, :len(ids)] = torch.tensor(ids, dtype=torch.long)
+            attention_mask[i, :len(ids)] = 1
+        with torch.inference_mode():
+            output_ids = self.model.generate(input_ids, attention_mask=attention_mask, **GENERATE_KWARGS)
+        return output_ids.tolist()
+
+def load_int8_model(model_name):
+    import torch
+    from transformers import AutoModelForSeq2SeqLM
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+    model.eval()
+    # fp32 사본을 따로 두지 않도록 제자리 양자화
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+def _flatten_past(past_key_values):
+    return [tensor for layer in past_key_values for tensor in layer]
+
+def _past_names(prefix, num_layers):
+    return [f"{prefix}.{layer}.{kind}" for layer in range(num_layers) for kind in ("self_key", "self_value", "cross_key", "cross_value")]
+
+def export_onnx(model_name, output_dir):
+    import torch
+    from transformers import AutoModelForSeq2SeqLM
+
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+    model.eval()
+    model.config.use_cache = True
+    num_layers = model.config.num_decoder_layers
+    # T5 계열은 임베딩을 공유할 때 lm_head 전에 출력 스케일을 조정함
+    scale = model.config.d_model ** -0.5 if model.config.tie_word_embeddings else 1.0
+
+    class Encoder(torch.nn.Module):
+        def forward(self, input_ids, attention_mask):
+            return model.get_encoder()(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+
+    class DecoderInit(torch.nn.Module):
+        def forward(self, decoder_input_ids, encoder_hidden_states, encoder_attention_mask):
+            outputs = model.get_decoder()(
+                input_ids=decoder_input_ids,
+                encoder_hidden_states=encoder_hidden_states,
+                encoder_attention_mask=encoder_attention_mask,
+                use_cache=True
+            )
+            logits = model.lm_head(outputs.last_hidden_state * scale)
+            return (logits, *_flatten_past(outputs.past_key_values))
+
+    class DecoderWithPast(torch.nn.Module):
+        def forward(self, decoder_input_ids, encoder_hidden_states, encoder_attention_mask, *past):
+            past_key_values = tuple(tuple(past[i:i + 4]) for i in range(0, len(past), 4))
+            outputs = model.get_decoder()(
+                input_ids=decoder_input_ids,
+                encoder_hidden_states=encoder_hidden_states,
+                encoder_attention_mask=encoder_attention_mask,
+                past_key_values=past_key_values,
+                use_cache=True
+            )
+            logits = model.lm_head(outputs.last_hidden_state * scale)
+            return (logits, *_flatten_past(outputs.past_key_values))
+
+    os.makedirs(output_dir, exist_ok=True)
+    input_ids = torch.ones((1, 8), dtype=torch.long)
+    attention_mask = torch.ones((1, 8), dtype=torch.long)
+    decoder_input_ids = torch.full((1, 1), model.config.decoder_start_token_id, dtype=torch.long)
+    past_axes = {0: "batch", 2: "past_sequence"}
+    present_axes = {0: "batch", 2: "present_sequence"}
+
+    with torch.no_grad():
+        torch.onnx.export(
+            Encoder(), (input_ids, attention_mask), os.path.join(output_dir, "encoder.onnx"),
+            input_names=["input_ids", "attention_mask"], output_names=["encoder_hidden_states"],
+            dynamic_axes={"input_ids": {0: "batch", 1: "sequence"}, "attention_mask": {0: "batch", 1: "sequence"},
+                          "encoder_hidden_states": {0: "batch", 1: "sequence"}},
+            opset_version=14
+        )
+        encoder_hidden_states = Encoder()(input_ids, attention_mask)
+        common_axes = {"decoder_input_ids": {0: "batch"}, "encoder_hidden_states": {0: "batch", 1: "sequence"},
+                       "encoder_attention_mask": {0: "batch", 1: "sequence"}, "logits": {0: "batch"}}
+        present_names = _past_names("present", num_layers)
+        torch.onnx.export(
+            DecoderInit(), (decoder_input_ids, encoder_hidden_states, attention_mask),
+            os.path.join(output_dir, "decoder_init.onnx"),
+            input_names=["decoder_input_ids", "encoder_hidden_states", "encoder_attention_mask"],
+            output_names=["logits", *present_names],
+            dynamic_axes={**common_axes, **{name: present_axes for name in present_names}},
+            opset_version=14
+        )
+        init_outputs = DecoderInit()(decoder_input_ids, encoder_hidden_states, attention_mask)
+        past_names = _past_names("past", num_layers)
+        torch.onnx.export(
+            DecoderWithPast(), (decoder_input_ids, encoder_hidden_states, attention_mask, *init_outputs[1:]),
+            os.path.join(output_dir, "decoder_with_past.onnx"),
+            input_names=["decoder_input_ids", "encoder_hidden_states", "encoder_attention_mask", *past_names],
+            output_names=["logits", *present_names],
+            dynamic_axes={**common_axes, **{name: past_axes for name in past_names}, **{name: present_axes for name in present_names}},
+            opset_version=14
+        )
+    del model
+
+def _log_softmax(logits):
+    shifted = logits - logits.max(axis=-1, keepdims=True)
+    return shifted - np.log(np.exp(shifted).sum(axis=-1, keepdims=True))
+
+class OnnxBackend:
+    name = 'onnx'
+
+    def __init__(self, model_name, onnx_dir, pad_token_id, eos_token_id, decoder_start_token_id):
+        import onnxruntime as ort
+        if not all(os.path.exists(os.path.join(onnx_dir, f"{part}.onnx")) for part in ("encoder", "decoder_init", "decoder_with_past")):
+            logging.info(f"Exporting {model_name} to ONNX in {onnx_dir}")
+            export_onnx(model_name, onnx_dir)
+        options = ort.SessionOptions()
+        if ORT_NUM_THREADS:
+            options.intra_op_num_threads = ORT_NUM_THREADS
+        providers = ["CPUExecutionProvider"]
+        self.encoder = ort.InferenceSession(os.path.join(onnx_dir, "encoder.onnx"), options, providers=providers)
+        self.decoder_init = ort.InferenceSession(os.path.join(onnx_dir, "decoder_init.onnx"), options, providers=providers)
+        self.decoder_with_past = ort.InferenceSession(os.path.join(onnx_dir, "decoder_with_past.onnx"), options, providers=providers)
+        self.pad_token_id = pad_token_id
+        self.eos_token_id = eos_token_id
+        self.decoder_start_token_id = decoder_start_token_id
+
+    def _run(self, session, feeds):
+        # 내보내기 과정에서 사용되지 않아 제거된 입력은 넘기지 않음
+        names = {node.name for node in session.get_inputs()}
+        return session.run(None, {name: value for name, value in feeds.items() if name in names})
+
+    def generate(self, batch_input_ids):
+        num_beams = GENERATE_KWARGS['num_beams']
+        max_length = GENERATE_KWARGS['max_length']
+        min_length = GENERATE_KWARGS['min_length']
+        length_penalty = GENERATE_KWARGS['length_penalty']
+        batch_size = len(batch_input_ids)
+
+        max_len = max(len(ids) for ids in batch_input_ids)
+        input_ids = np.full((batch_size, max_len), self.pad_token_id, dtype=np.int64)
+        attention_mask = np.zeros((batch_size, max_len), dtype=np.int64)
+        for i, ids in enumerate(batch_input_ids):
+            input_ids[i, :len(ids)] = ids
+            attention_mask[i, :len(ids)] = 1
+
+        encoder_hidden_states = self._run(self.encoder, {"input_ids": input_ids, "attention_mask": attention_mask})[0]
+        # 각 입력을 빔 수만큼 복제 (batch * beams)
+        encoder_hidden_states = np.repeat(encoder_hidden_states, num_beams, axis=0)
+        encoder_attention_mask = np.repeat(attention_mask, num_beams, axis=0)
+
+        beam_scores = np.zeros((batch_size, num_beams), dtype=np.float32)
+        beam_scores[:, 1:] = -1e9
+        sequences = np.full((batch_size * num_beams, 1), self.decoder_start_token_id, dtype=np.int64)
+        finished = [[] for _ in range(batch_size)]
+        done = [False] * batch_size
+        past = None
+
+        for cur_len in range(1, max_length):
+            feeds = {
+                "decoder_input_ids": sequences[:, -1:],
+                "encoder_hidden_states": encoder_hidden_states,
+                "encoder_attention_mask": encoder_attention_mask
+            }
+            if past is None:
+                outputs = self._run(self.decoder_init, feeds)
+            else:
+                feeds.update({f"past.{i // 4}.{('self_key', 'self_value', 'cross_key', 'cross_value')[i % 4]}": tensor for i, tensor in enumerate(past)})
+                outputs = self._run(self.decoder_with_past, feeds)
+            log_probs = _log_softmax(outputs[0][:, -1, :].astype(np.float32))
+            if cur_len < min_length:
+                log_probs[:, self.eos_token_id] = -np.inf
+            vocab_size = log_probs.shape[-1]
+            scores = (beam_scores.reshape(-1, 1) + log_probs).reshape(batch_size, num_beams * vocab_size)
+
+            next_scores = np.zeros((batch_size, num_beams), dtype=np.float32)
+            next_tokens = np.full((batch_size, num_beams), self.pad_token_id, dtype=np.int64)
+            next_beams = np.zeros((batch_size, num_beams), dtype=np.int64)
+            for b in range(batch_size):
+                if done[b]:
+                    continue
+                candidates = np.argpartition(-scores[b], 2 * num_beams)[:2 * num_beams]
+                candidates = candidates[np.argsort(-scores[b][candidates])]
+                selected = 0
+                for rank, candidate in enumerate(candidates):
+                    beam, token = divmod(int(candidate), vocab_size)
+                    score = float(scores[b, candidate])
+                    if token == self.eos_token_id:
+                        if rank < num_beams:
+                            hypothesis = sequences[b * num_beams + beam].tolist()
+                            finished[b].append((score / (len(hypothesis) ** length_penalty), hypothesis))
+                        continue
+                    next_scores[b, selected] = score
+                    next_tokens[b, selected] = token
+                    next_beams[b, selected] = beam
+                    selected += 1
+                    if selected == num_beams:
+                        break
+                # early_stopping=True: 빔 수만큼 완료 가설이 모이면 종료
+                if len(finished[b]) >= num_beams:
+                    done[b] = True
+            if all(done):
+                break
+
+            beam_scores = next_scores
+            beam_index = (next_beams + np.arange(batch_size).reshape(-1, 1) * num_beams).reshape(-1)
+            sequences = np.concatenate([sequences[beam_index], next_tokens.reshape(-1, 1)], axis=1)
+            # 선택된 빔 순서대로 KV 캐시를 재배열
+            past = [tensor[beam_index] for tensor in outputs[1:]]
+
+        results = []
+        for b in range(batch_size):
+            if not finished[b]:
+                for beam in range(num_beams):
+                    hypothesis = sequences[b * num_beams + beam].tolist()
+                    finished[b].append((float(beam_scores[b, beam]) / (len(hypothesis) ** length_penalty), hypothesis))
+            results.append(max(finished[b], key=lambda item: item[0])[1])
+        return results
+
+def create_backend(name, model_name, tokenizer, fp32_model_loader):
+    if name == 'torch':
+        return TorchBackend(fp32_model_loader(), tokenizer.pad_token_id)
+    if name == 'torch-int8':
+        return TorchBackend(load_int8_model(model_name), tokenizer.pad_token_id, name='torch-int8')
+    if name == 'onnx':
+        from transformers import AutoConfig
+        config = AutoConfig.from_pretrained(model_name)
+        return OnnxBackend(model_name, SUMMARIZER_ONNX_DIR, tokenizer.pad_token_id, tokenizer.eos_token_id, config.decoder_start_token_id)
+    raise ValueError(f"Unknown summarizer backend: {name}")
+
+def check_parity(backend, reference, tokenizer, texts, max_input_tokens=1024):
+    # 기준(fp32) 백엔드와 비교해 출력 일치율과 지연 시간을 보고
+    batch_input_ids = tokenizer(list(texts), max_length=max_input_tokens, truncation=True)['input_ids']
+    report = {"backend": backend.name, "samples": len(texts), "exact_match": 0, "token_similarity": [], "latency": {}}
+    outputs = {}
+    # 두 백엔드의 이름이 같을 수 있으므로 역할(reference/candidate)로 구분해 저장
+    for role, candidate in (("reference", reference), ("candidate", backend)):
+        started = time.perf_counter()
+        outputs[role] = [candidate.generate([ids])[0] for ids in batch_input_ids]
+        report["latency"][role] = round((time.perf_counter() - started) / len(texts), 4)
+    for expected, actual in zip(outputs["reference"], outputs["candidate"]):
+        expected_text = tokenizer.decode(expected, skip_special_tokens=True)
+        actual_text = tokenizer.decode(actual, skip_special_tokens=True)
+        report["exact_match"] += int(expected_text == actual_text)
+        report["token_similarity"].append(difflib.SequenceMatcher(None, expected, actual).ratio())
+    report["exact_match"] = report["exact_match"] / len(texts)
+    report["token_similarity"] = round(float(np.mean(report["token_similarity"])), 4)
+    return report
@@ -0,0 +1,110 @@
+import hashlib
+import logging
+import os
+import time
+from pdf_extract import PdfSource, create_pdf_backend
+from tracing import stage, record_stage
+
+CHUNK_SIZE = int(os.getenv('INGEST_CHUNK_SIZE', '1000'))
+CHUNK_OVERLAP = int(os.getenv('INGEST_CHUNK_OVERLAP', '200'))
+INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', '64'))
+
+def iter_pdf_pages(backend, source, total_pages):
+    # 페이지를 하나씩 추출해 전체 텍스트를 메모리에 모으지 않음
+    extract_time = 0.0
+    extracted_chars = 0
+    started = time.perf_counter()
+    pages = backend.iter_pages(source, total_pages)
+    try:
+        while True:
+            page_started = time.perf_counter()
+            try:
+                page_num, text = next(pages)
+            except StopIteration:
+                break
+            extract_time += time.perf_counter() - page_started
+            extracted_chars += len(text)
+            yield page_num, text
+    finally:
+        # 적재가 중간에 실패해도 진행 중인 추출 작업을 정리
+        pages.close()
+    # 추출은 적재와 번갈아 일어나므로 페이지별 추출(대기) 시간을 합쳐 한 단계로 기록
+    record_stage("pdf_extract", started, extract_time, {"backend": backend.name, "pages": total_pages, "chars": extracted_chars})
+
+def iter_chunks(pages, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    if not 0 <= overlap < chunk_size:
+        raise ValueError("overlap must be smaller than chunk_size")
+    for page_num, text in pages:
+        start = 0
+        while start < len(text):
+            end = min(start + chunk_size, len(text))
+            if end < len(text):
+                # 가능하면 창의 후반부에 있는 공백에서 끊어 단어가 잘리지 않게 함
+                boundary = text.rfind(' ', start + chunk_size // 2, end)
+                if boundary > start:
+                    end = boundary
+            chunk = text[start:end].strip()
+            if chunk:
+                yield {"text": chunk, "page": page_num, "offset": start}
+            if end >= len(text):
+                break
+            start = max(end - overlap, start + 1)
+
+def chunk_id(source_name, text):
+    # 같은 출처의 같은 내용은 항상 같은 id -> 재업로드 시 건너뜀
+    digest = hashlib.sha256(f"{source_name}\0{text}".encode('utf-8')).hexdigest()
+    return f"chunk_{digest[:40]}"
+
+def batched(items, batch_size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def ingest_chunks(collection, chunks, source_name, batch_size=INGEST_BATCH_SIZE, progress=None):
+    stats = {"source": source_name, "chunks": 0, "added": 0, "skipped": 0, "page": 0}
+    for batch in batched(chunks, batch_size):
+        unique = {}
+        for chunk in batch:
+            unique.setdefault(chunk_id(source_name, chunk["text"]), chunk)
+        ids = list(unique)
+        existing = set(collection.get(ids=ids)['ids'])
+        new_ids = [id_ for id_ in ids if id_ not in existing]
+        if new_ids:
+            with stage("chroma_add", documents=len(new_ids), bytes=sum(len(unique[id_]["text"].encode('utf-8')) for id_ in new_ids)):
+                collection.add(
+                    documents=[unique[id_]["text"] for id_ in new_ids],
+                    metadatas=[{"source": source_name, "page": unique[id_]["page"], "offset": unique[id_]["offset"]} for id_ in new_ids],
+                    ids=new_ids
+                )
+        stats["chunks"] += len(batch)
+        stats["added"] += len(new_ids)
+        stats["skipped"] += len(batch) - len(new_ids)
+        stats["page"] = batch[-1]["page"]
+        if progress:
+            progress(stats)
+    return stats
+
+def ingest_pdf(collection, pdf_file, source_name, batch_size=INGEST_BATCH_SIZE, progress=None, backend=None):
+    backend = backend or create_pdf_backend()
+    with PdfSource(pdf_file) as source:
+        total_pages = backend.page_count(source)
+
+        def report(stats):
+            if progress:
+                progress(dict(stats, total_pages=total_pages))
+
+        with stage("pdf_ingest", pages=total_pages, backend=backend.name) as trace:
+            pages = iter_pdf_pages(backend, source, total_pages)
+            stats = ingest_chunks(collection, iter_chunks(pages), source_name, batch_size, report)
+            trace.update(chunks=stats["chunks"], added=stats["added"])
+    stats["total_pages"] = total_pages
+    logging.debug(f"Ingested {source_name}: {stats}")
+    return stats
+
+def ingest_text(collection, text, source_name, batch_size=INGEST_BATCH_SIZE, progress=None):
+    return ingest_chunks(collection, iter_chunks([(1, text)]), source_name, batch_size, progress)
@@ -0,0 +1,351 @@
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+# 요약 모델을 하나씩 가진 작업자 프로세스 수와 프로세스당 동시 작업 수
+# (한 프로세스 안의 동시 작업은 요약 마이크로배치로 묶임)
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+JOB_SLOTS_PER_WORKER = int(os.getenv('JOB_SLOTS_PER_WORKER', '2'))
+JOB_WORKER_THREADS = int(os.getenv('JOB_WORKER_THREADS', str(max(1, (os.cpu_count() or 1) // max(JOB_WORKERS, 1)))))
+# 대기열 전체 / 사용자별 상한 (넘으면 QueueFullError)
+JOB_QUEUE_SIZE = int(os.getenv('JOB_QUEUE_SIZE', '40'))
+JOB_MAX_PER_USER = int(os.getenv('JOB_MAX_PER_USER', '2'))
+# 이 시간 동안 상태 조회가 없으면 세션이 떠난 것으로 보고 취소
+JOB_HEARTBEAT_TIMEOUT = float(os.getenv('JOB_HEARTBEAT_TIMEOUT', '30'))
+# 끝난 작업의 결과를 마지막 조회 후 보관하는 시간
+JOB_RESULT_TTL = float(os.getenv('JOB_RESULT_TTL', str(30 * 60)))
+# 작업자 프로세스 생존 확인 간격 (이벤트가 끊임없이 들어와도 이 간격마다 확인)
+JOB_WORKER_CHECK_INTERVAL = float(os.getenv('JOB_WORKER_CHECK_INTERVAL', '1'))
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+class QueueFullError(RuntimeError):
+    pass
+
+class JobCancelled(Exception):
+    pass
+
+def _worker_main(index, tasks, events):
+    # 작업자 프로세스: 모델을 한 번 로드한 뒤 ("run"/"cancel") 메시지를 처리
+    os.environ.setdefault('ORT_NUM_THREADS', str(JOB_WORKER_THREADS))
+    try:
+        import torch
+        torch.set_num_threads(JOB_WORKER_THREADS)
+    except ImportError:
+        pass
+    from resources import warmup, get_tokenizer, get_summarizer_backend
+    warmup(getters=(get_tokenizer, get_summarizer_backend))
+    events.put((index, None, "ready", None))
+
+    cancelled = set()
+    cancelled_lock = threading.Lock()
+    executor = ThreadPoolExecutor(max_workers=JOB_SLOTS_PER_WORKER, thread_name_prefix=f"job-worker-{index}")
+
+    def emit(job_id, kind, payload=None):
+        events.put((index, job_id, kind, payload))
+
+    def check(job_id):
+        with cancelled_lock:
+            if job_id in cancelled:
+                raise JobCancelled()
+
+    def run(job_id, news_text):
+        try:
+            emit(job_id, "done", _run_job(job_id, news_text, emit, check))
+        except JobCancelled:
+            emit(job_id, CANCELLED)
+        except Exception as e:
+            logging.error(f"Error in job {job_id}: {str(e)}")
+            emit(job_id, FAILED, str(e))
+        finally:
+            with cancelled_lock:
+                cancelled.discard(job_id)
+
+    while True:
+        message = tasks.get()
+        if message is None:
+            break
+        kind, job_id, payload = message
+        if kind == "run":
+            executor.submit(run, job_id, payload)
+        elif kind == "cancel":
+            with cancelled_lock:
+                cancelled.add(job_id)
+    executor.shutdown(wait=False, cancel_futures=True)
+
+def _run_job(job_id, news_text, emit, check):
+    from dedup import find_duplicate, remember
+    from tracing import start_run
+
+    with start_run("research") as run:
+        check(job_id)
+        # 거의 같은 기사를 이미 처리했다면 요약과 GPT/검색 호출 없이 이전 결과를 재사용
+        duplicate = find_duplicate(news_text)
+        if duplicate is not None:
+            emit(job_id, "summary", duplicate["summary"])
+            result = duplicate
+        else:
+            result = _research(job_id, news_text, emit, check)
+            if not result.get("analysis_error"):
+                remember(news_text, result)
+    result["timeline"] = run.timeline()
+    result["run_started"] = run.wall_started
+    return result
+
+def _research(job_id, news_text, emit, check):
+    from utils import iter_summarize_news
+    from pipeline import run_research_pipeline
+
+    summary = None
+    for event in iter_summarize_news(news_text):
+        check(job_id)
+        if event["stage"] == "map":
+            emit(job_id, "progress", {"window": event["window"], "total": event["total"], "summary": event["summary"]})
+        summary = event["summary"]
+    if not summary:
+        return {"error": "요약 생성에 실패했습니다."}
+    emit(job_id, "summary", summary)
+    result = run_research_pipeline(summary, stream_analysis=True)
+    analysis_stream = result.pop("analysis_stream", None)
+    if analysis_stream is not None:
+        # 분석은 조각 단위로 전달해 화면이 생성되는 대로 그릴 수 있게 함
+        parts = []
+        try:
+            for part in analysis_stream:
+                check(job_id)
+                parts.append(part)
+                emit(job_id, "analysis", part)
+        except JobCancelled:
+            analysis_stream.close()
+            raise
+        except Exception as e:
+            result["analysis_error"] = str(e)
+        result["analysis"] = "".join(parts)
+    return result
+
+class Job:
+    def __init__(self, user_id, news_text, priority):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.news_text = news_text
+        self.priority = priority
+        self.status = QUEUED
+        self.worker = None
+        self.progress = None
+        self.summary = None
+        self.analysis_parts = []
+        self.result = None
+        self.error = None
+        self.cancel_requested = False
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.heartbeat = time.monotonic()
+
+class WorkerProcess:
+    def __init__(self, index, context, events):
+        self.index = index
+        self.tasks = context.Queue()
+        self.process = context.Process(target=_worker_main, args=(index, self.tasks, events), name=f"job-worker-{index}", daemon=True)
+        self.running = set()
+        self.ready = False
+        self.process.start()
+
+class JobQueue:
+    # 사용자별 대기열을 두고, 우선순위가 같으면 가장 오래 기다린 사용자의 작업부터 작업자에 배정
+    def __init__(self, workers=JOB_WORKERS, slots=JOB_SLOTS_PER_WORKER, max_queued=JOB_QUEUE_SIZE,
+                 max_per_user=JOB_MAX_PER_USER, heartbeat_timeout=JOB_HEARTBEAT_TIMEOUT, result_ttl=JOB_RESULT_TTL):
+        self.slots = slots
+        self.max_queued = max_queued
+        self.max_per_user = max_per_user
+        self.heartbeat_timeout = heartbeat_timeout
+        self.result_ttl = result_ttl
+        # torch 등이 스레드를 띄운 상태에서 fork하지 않도록 spawn 사용
+        self.context = multiprocessing.get_context('spawn')
+        self.events = self.context.Queue()
+        self.condition = threading.Condition()
+        self.jobs = {}
+        self.pending = OrderedDict()
+        self.last_served = {}
+        self.closed = False
+        self.workers = [WorkerProcess(index, self.context, self.events) for index in range(workers)]
+        self.threads = [
+            threading.Thread(target=self._dispatch_loop, name="job-dispatcher", daemon=True),
+            threading.Thread(target=self._collect_loop, name="job-collector", daemon=True)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, user_id, news_text, priority=0):
+        # priority는 작을수록 먼저 처리
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("Job queue is closed")
+            queued = sum(len(jobs) for jobs in self.pending.values())
+            if queued >= self.max_queued:
+                raise QueueFullError("요청이 많아 대기열이 가득 찼습니다. 잠시 후 다시 시도해 주세요.")
+            active = sum(1 for job in self.jobs.values() if job.user_id == user_id and job.status in (QUEUED, RUNNING))
+            if active >= self.max_per_user:
+                raise QueueFullError(f"사용자당 동시에 {self.max_per_user}건까지 처리할 수 있습니다.")
+            job = Job(user_id, news_text, priority)
+            self.jobs[job.id] = job
+            self.pending.setdefault(user_id, deque()).append(job)
+            self.condition.notify_all()
+            return job.id
+
+    def status(self, job_id, touch=True):
+        # UI의 주기적 조회가 곧 세션 생존 신호
+        with self.condition:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            if touch:
+                job.heartbeat = time.monotonic()
+            return {
+                "id": job.id,
+                "status": job.status,
+                "position": self._position(job) if job.status == QUEUED else 0,
+                "progress": job.progress,
+                "summary": job.summary,
+                "analysis": "".join(job.analysis_parts),
+                "result": job.result,
+                "error": job.error,
+                "created": job.created,
+                "started": job.started,
+                "finished": job.finished
+            }
+
+    def cancel(self, job_id):
+        with self.condition:
+            job = self.jobs.get(job_id)
+            if job is not None:
+                self._cancel(job)
+
+    def stats(self):
+        with self.condition:
+            counts = {}
+            for job in self.jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return {"jobs": counts, "workers": [{"index": worker.index, "ready": worker.ready, "running": len(worker.running)} for worker in self.workers]}
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        for worker in self.workers:
+            worker.tasks.put(None)
+        for worker in self.workers:
+            worker.process.join(timeout=5)
+
+    def _position(self, job):
+        # 대기 중인 작업 중 이 작업보다 먼저 배정될 작업 수 (대략값)
+        return sum(1 for jobs in self.pending.values() for other in jobs if (other.priority, other.created) < (job.priority, job.created))
+
+    def _cancel(self, job):
+        if job.status == QUEUED:
+            self.pending[job.user_id].remove(job)
+            if not self.pending[job.user_id]:
+                del self.pending[job.user_id]
+            self._finish(job, CANCELLED)
+        elif job.status == RUNNING and not job.cancel_requested:
+            # 작업자가 다음 단계 사이에서 중단하고 "cancelled"를 보내옴
+            job.cancel_requested = True
+            job.worker.tasks.put(("cancel", job.id, None))
+
+    def _finish(self, job, status, result=None, error=None):
+        job.status = status
+        job.result = result
+        job.error = error
+        job.finished = time.time()
+        job.news_text = None
+        if job.worker is not None:
+            job.worker.running.discard(job.id)
+        self.condition.notify_all()
+
+    def _next_job(self):
+        if not self.pending:
+            return None
+        user_id = min(self.pending, key=lambda user: (self.pending[user][0].priority, self.last_served.get(user, 0.0), self.pending[user][0].created))
+        jobs = self.pending[user_id]
+        job = jobs.popleft()
+        if not jobs:
+            del self.pending[user_id]
+        self.last_served[user_id] = time.monotonic()
+        return job
+
+    def _reap(self):
+        now = time.monotonic()
+        for job in list(self.jobs.values()):
+            idle = now - job.heartbeat
+            if job.status in (QUEUED, RUNNING) and idle > self.heartbeat_timeout:
+                logging.debug(f"Cancelling abandoned job {job.id}")
+                self._cancel(job)
+            elif job.status in FINISHED and idle > self.result_ttl:
+                del self.jobs[job.id]
+        for user_id in list(self.last_served):
+            if user_id not in self.pending and now - self.last_served[user_id] > self.result_ttl:
+                del self.last_served[user_id]
+
+    def _dispatch_loop(self):
+        last_check = time.monotonic()
+        with self.condition:
+            while not self.closed:
+                if time.monotonic() - last_check >= JOB_WORKER_CHECK_INTERVAL:
+                    self._check_workers()
+                    last_check = time.monotonic()
+                self._reap()
+                worker = min((worker for worker in self.workers if worker.ready and len(worker.running) < self.slots),
+                             key=lambda worker: len(worker.running), default=None)
+                job = self._next_job() if worker is not None else None
+                if job is None:
+                    self.condition.wait(timeout=JOB_WORKER_CHECK_INTERVAL)
+                    continue
+                job.status = RUNNING
+                job.worker = worker
+                job.started = time.time()
+                worker.running.add(job.id)
+                worker.tasks.put(("run", job.id, job.news_text))
+
+    def _collect_loop(self):
+        while not self.closed:
+            try:
+                index, job_id, kind, payload = self.events.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            with self.condition:
+                if kind == "ready":
+                    self.workers[index].ready = True
+                    self.condition.notify_all()
+                    continue
+                job = self.jobs.get(job_id)
+                if job is None or job.status in FINISHED:
+                    continue
+                if kind == "progress":
+                    job.progress = payload
+                elif kind == "summary":
+                    job.summary = payload
+                elif kind == "analysis":
+                    job.analysis_parts.append(payload)
+                elif kind == "done":
+                    self._finish(job, DONE, result=payload)
+                elif kind == FAILED:
+                    self._finish(job, FAILED, error=payload)
+                elif kind == CANCELLED:
+                    self._finish(job, CANCELLED)
+
+    def _check_workers(self):
+        # 작업자가 죽으면 맡았던 작업을 실패 처리하고 새 프로세스로 교체 (self.condition을 잡은 상태에서 호출)
+        for index, worker in enumerate(self.workers):
+            if self.closed or worker.process.is_alive():
+                continue
+            logging.error(f"Job worker {index} exited with code {worker.process.exitcode}")
+            for job_id in list(worker.running):
+                self._finish(self.jobs[job_id], FAILED, error="작업자 프로세스가 비정상 종료되었습니다.")
+            self.workers[index] = WorkerProcess(index, self.context, self.events)
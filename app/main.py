@@ -1,25 +1,82 @@
 import streamlit as st
-import yfinance as yf
 import pandas as pd
+import altair as alt
 import logging
-from utils import summarize_news, generate_search_query_with_gpt, search_combined, analyze_with_gpt, classify_steep_with_gpt, select_related_company, process_pdf_and_store_vectors, process_text_and_store_vectors, generate_rag_report, generate_analysis_with_keywords
+import hashlib
+import time
+import uuid
+from utils import process_pdf_and_store_vectors, process_text_and_store_vectors, generate_rag_report_stream
+from jobs import JobQueue, QueueFullError, DONE, FINISHED
+from resources import warmup, get_collection
+from market_data import get_market_report
+from charts import CHART_RANGES, prepare_chart_data
+from tracing import start_run, stage_percentiles
 
 import logging
 from utils import process_pdf_and_store_vectors, process_text_and_store_vectors
 
 logging.basicConfig(level=logging.DEBUG, filename='app_debug.log', format='%(asctime)s %(levelname)s:%(message)s')
 
+JOB_POLL_INTERVAL = 0.5
+
+@st.cache_resource
+def start_warmup():
+    # 요약 모델은 작업자 프로세스가 로드하므로 여기서는 벡터 DB만 백그라운드로 미리 로드
+    return warmup(background=True, getters=(get_collection,))
+
+@st.cache_resource
+def get_job_queue():
+    # 모든 세션이 공유하는 작업 대기열과 작업자 프로세스
+    return JobQueue()
+
+start_warmup()
+job_queue = get_job_queue()
+
 st.image("assets/full_logo_cut.png", width=200)  # 로고 이미지 경로
 
 # PDF 업로드 섹션
 st.sidebar.markdown("<h2 style='color:#0E1B4A;'>PDF 업로드</h2>", unsafe_allow_html=True)
 uploaded_file = st.sidebar.file_uploader("PDF 파일을 업로드", type="pdf")
 
-pdf_text = None
+@st.cache_resource
+def get_ingested_files():
+    # 세션 간에 공유되는 (파일 내용 해시 -> 적재 결과) 기록
+    return {}
+
+def ingest_uploaded_file(uploaded_file):
+    # Streamlit은 위젯 조작마다 스크립트를 다시 실행하므로 같은 파일은 한 번만 처리
+    file_hashes = st.session_state.setdefault('uploaded_file_hashes', {})
+    file_hash = file_hashes.get(uploaded_file.file_id)
+    if file_hash is None:
+        # 해시 계산은 버퍼를 그대로 사용 (PDF 추출 단계에서는 PyMuPDF에 넘기기 위해 bytes로 한 번 복사함)
+        file_hash = hashlib.sha256(uploaded_file.getbuffer()).hexdigest()
+        file_hashes[uploaded_file.file_id] = file_hash
+
+    ingested_files = get_ingested_files()
+    if file_hash in ingested_files:
+        return ingested_files[file_hash]
+
+    progress_bar = st.sidebar.progress(0.0, text="PDF 처리 중...")
+
+    def update_progress(stats):
+        progress_bar.progress(
+            min(stats['page'] / max(stats['total_pages'], 1), 1.0),
+            text=f"PDF 처리 중... ({stats['page']}/{stats['total_pages']} 페이지)"
+        )
+
+    try:
+        pdf_info = process_pdf_and_store_vectors(uploaded_file, progress=update_progress)
+    finally:
+        # 실패해도 진행 표시줄이 오류 메시지 옆에 남지 않도록 정리
+        progress_bar.empty()
+    ingested_files[file_hash] = pdf_info
+    return pdf_info
+
+pdf_info = None
 if uploaded_file:
     try:
         logging.debug("PDF 파일 업로드됨: %s", uploaded_file.name)
-        pdf_text = process_pdf_and_store_vectors(uploaded_file)
+        pdf_info = ingest_uploaded_file(uploaded_file)
         st.sidebar.success("PDF 파일이 성공적으로 업로드 및 벡터화되었습니다.")
     except Exception as e:
         logging.error("PDF 파일 처리 중 오류 발생: %s", str(e))
@@ -36,11 +93,23 @@ def display_error(message):
 def display_warning(message):
     st.warning(message)
 
-def format_results(results):
-    formatted_results = ""
-    for i, result in enumerate(results):
-        formatted_results += f"{i+1}. {result['title']} ({result['link']})<br><br>"
-    return formatted_results
+def display_timing(run):
+    timeline = run.timeline()
+    if not timeline:
+        return
+    with st.expander("실행 시간 분석"):
+        timing_df = pd.DataFrame(timeline)
+        timing_df['label'] = [f"{i + 1:02d}. {name}" for i, name in enumerate(timing_df['stage'])]
+        chart = alt.Chart(timing_df).mark_bar().encode(
+            x=alt.X('start:Q', title='경과 시간 (초)'),
+            x2='end:Q',
+            y=alt.Y('label:N', title=None, sort=None),
+            color=alt.Color('thread:N', legend=None),
+            tooltip=[column for column in timing_df.columns if column != 'label']
+        )
+        st.altair_chart(chart, use_container_width=True)
+        st.markdown("##### 단계별 지연 시간 (최근 실행 기준, 초)")
+        st.dataframe(pd.DataFrame.from_dict(stage_percentiles(), orient='index'))
 
 def get_first_four_sentences(text):
     if text:
@@ -48,229 +117,256 @@ def get_first_four_sentences(text):
         return '.'.join(sentences[:4]) + '.'
     return text
 
+def get_user_id():
+    # 세션 단위로 공정하게 배정하기 위한 식별자
+    return st.session_state.setdefault('user_id', uuid.uuid4().hex)
+
+def wait_for_job(job_id):
+    # 작업이 끝날 때까지 상태를 조회하며 진행 상황을 표시 (조회가 끊기면 작업이 취소됨)
+    status_box = st.empty()
+    analysis_box = st.empty()
+    while True:
+        job = job_queue.status(job_id)
+        if job is None or job["status"] in FINISHED:
+            status_box.empty()
+            analysis_box.empty()
+            return job
+        if job["status"] == "queued":
+            status_box.info(f"대기 중... (앞선 요청 {job['position']}건)")
+        elif job["progress"] and not job["summary"]:
+            # 긴 문서는 창별 부분 요약을 도착하는 대로 표시
+            progress = job["progress"]
+            status_box.info(f"긴 문서 요약 중... ({progress['window']}/{progress['total']})\n\n{progress['summary']}")
+        elif job["summary"]:
+            status_box.info(f"리서치 자료 생성 중...\n\n{job['summary']}")
+        if job["analysis"]:
+            analysis_box.markdown(job["analysis"])
+        time.sleep(JOB_POLL_INTERVAL)
+
 if st.button("리서치 자료 생성"):
-    with st.spinner('처리 중...'):
-        summary = summarize_news(news_text)
-        if not summary:
-            display_error("요약 생성에 실패했습니다.")
+    previous_job_id = st.session_state.pop('job_id', None)
+    if previous_job_id:
+        job_queue.cancel(previous_job_id)
+    try:
+        st.session_state['job_id'] = job_queue.submit(get_user_id(), news_text)
+    except QueueFullError as e:
+        display_warning(str(e))
+
+# 작업 id는 세션에 남아 있어 위젯 조작으로 스크립트가 다시 실행돼도 이어서 조회함
+job_id = st.session_state.get('job_id')
+if job_id:
+    with start_run("research") as run:
+        with st.spinner('처리 중...'):
+            job = wait_for_job(job_id)
+        if job is None:
+            # 결과 보관 기간이 지난 작업
+            st.session_state.pop('job_id', None)
+        elif job["status"] != DONE:
+            display_error(job["error"] or "작업이 취소되었습니다.")
         else:
-            steep_classification_response = classify_steep_with_gpt(summary)
-            if "error" in steep_classification_response:
-                display_error(steep_classification_response["error"])
+            pipeline_result = job["result"]
+            # 대기 시간과 작업자에서 실행된 단계를 이 실행의 폭포 차트에 합침 (지연 통계에는 작업당 한 번만 반영)
+            record = st.session_state.get('timed_job_id') != job_id
+            st.session_state['timed_job_id'] = job_id
+            run.merge([{"stage": "job_queue", "start": 0.0, "end": round(job["started"] - job["created"], 4),
+                        "duration": round(job["started"] - job["created"], 4), "thread": "queue"}], job["created"], record)
+            run.merge(pipeline_result.get("timeline", []), pipeline_result.get("run_started", job["started"]), record)
+            summary = pipeline_result.get("summary")
+            if "error" in pipeline_result:
+                display_error(pipeline_result["error"])
             else:
-                steep_classification = steep_classification_response['choices'][0]['message']['content'].strip().lower()
-                
-                search_query_response = generate_search_query_with_gpt(summary)
-                if "error" in search_query_response:
-                    display_error(search_query_response["error"])
-                else:
-                    search_query = search_query_response['choices'][0]['message']['content']
+                steep_classification = pipeline_result['steep_classification']
+                google_scholar_content = pipeline_result['google_scholar_content']
+                naver_news_content = pipeline_result['naver_news_content']
+                keywords = pipeline_result['keywords']
+
+                if pipeline_result.get('duplicate'):
+                    st.info(f"거의 같은 기사(유사도 {pipeline_result['similarity']:.0%})의 이전 분석 결과를 재사용했습니다.")
+
+                st.markdown("<h2 style='color:#0E1B4A;'>요약</h2>", unsafe_allow_html=True)
+                st.text_area("요약내용", summary, height=110, label_visibility="hidden")
+
+                # 검색 결과 표시
+                st.markdown("<h2 style='color:#0E1B4A;'>리서치 자료</h2>", unsafe_allow_html=True)
+                if pipeline_result.get('search_missing'):
+                    st.caption(f"응답이 늦은 검색 백엔드를 제외하고 생성했습니다: {', '.join(pipeline_result['search_missing'])}")
 
-                    google_scholar_results, naver_news_results, google_results, naver_search_results = search_combined(search_query)
+                # 생성 중에는 wait_for_job에서 조각 단위로 표시하고, 완료 후 전체를 표시
+                st.markdown("#### 개요")
+                st.markdown(pipeline_result['analysis'])
+                if pipeline_result.get('analysis_error'):
+                    display_error(pipeline_result['analysis_error'])
 
-                    if "error" in google_scholar_results:
-                        display_error(google_scholar_results["error"])
-                    elif "error" in naver_news_results:
-                        display_error(naver_news_results["error"])
+                st.markdown(f"""
+                <div class='results-container'>
+                    <div class='keywords'>
+                        <h4>핵심 키워드 설명</h4>
+                        <p>{keywords}</p>
+                    </div>
+                    <div class='google-scholar'>
+                        <h4>학술 자료</h4>
+                        <p>{google_scholar_content}</p>
+                    </div>
+                    <div class='naver-news'>
+                        <h4>관련 자료</h4>
+                        <p>{naver_news_content}</p>
+                    </div>
+                </div>
+                """, unsafe_allow_html=True)
+                
+                if steep_classification == 'economic':
+                    if pipeline_result['ticker_error']:
+                        display_error(pipeline_result['ticker_error'])
                     else:
-                        google_scholar_content = format_results(google_scholar_results.get('organic_results', [])[:3])
-                        naver_news_content = format_results(naver_news_results.get('items', [])[:3])
-
-                        google_scholar_content = google_scholar_content or "구글 스칼라에서 결과를 찾을 수 없습니다."
-                        naver_news_content = naver_news_content or "네이버 뉴스에서 결과를 찾을 수 없습니다."
-
-                        combined_content = f"구글 스칼라:\n{google_scholar_content}\n\n네이버 뉴스:\n{naver_news_content}"
-                        combined_content += f"\n\n구글 검색 결과:\n{format_results(google_results.get('organic_results', [])[:3])}"
-                        combined_content += f"\n\n네이버 검색 결과:\n{format_results(naver_search_results.get('items', [])[:3])}"
-                        combined_content = combined_content[:4000]
-
-                        analysis_with_keywords = generate_analysis_with_keywords(summary, combined_content)
-                        
-                        if "error" in analysis_with_keywords:
-                            display_error(f"오류: {analysis_with_keywords['error']}")
-                        else:
-                            analysis = analysis_with_keywords['analysis']
-                            keywords = analysis_with_keywords['keywords']
-
-                            st.markdown("<h2 style='color:#0E1B4A;'>요약</h2>", unsafe_allow_html=True)
-                            st.text_area("요약내용", summary, height=110, label_visibility="hidden")
-
-                            # 검색 결과 표시
-                            st.markdown("<h2 style='color:#0E1B4A;'>리서치 자료</h2>", unsafe_allow_html=True)
-
-                            st.markdown(f"""
-                            <div class='results-container'>
-                                <div class='overview'>
-                                    <h4>개요</h4>
-                                    <p>{analysis}</p>
-                                </div>
-                                <div class='keywords'>
-                                    <h4>핵심 키워드 설명</h4>
-                                    <p>{keywords}</p>
-                                </div>
-                                <div class='google-scholar'>
-                                    <h4>학술 자료</h4>
-                                    <p>{google_scholar_content}</p>
-                                </div>
-                                <div class='naver-news'>
-                                    <h4>관련 자료</h4>
-                                    <p>{naver_news_content}</p>
-                                </div>
-                            </div>
-                            """, unsafe_allow_html=True)
-                            
-                            if steep_classification == 'economic':
-                                company_response = select_related_company(summary)
-                                if "error" in company_response:
-                                    display_error(company_response["error"])
-                                else:
-                                    ticker = company_response['choices'][0]['message']['content'].strip()
-
-                                    try:
-                                        # yfinance를 통해 주식 티커에 대한 데이터 가져오기
-                                        ticker_data = yf.Ticker(ticker)
-                                        ticker_info = ticker_data.info
-
-                                        name = ticker_info.get('longName', 'N/A')
-                                        summary = get_first_four_sentences(ticker_info.get('longBusinessSummary', 'N/A'))
-                                        fullTimeEmployees = ticker_info.get('fullTimeEmployees', 'N/A')
-                                        industry = ticker_info.get('industry', 'N/A')
-                                        sector = ticker_info.get('sector', 'N/A')
-                                        currentPrice = ticker_info.get('currentPrice', 'N/A')
-                                        openPrice = ticker_info.get('open', 'N/A')
-                                        fiftytwoLow = ticker_info.get('fiftyTwoWeekLow', 'N/A')
-                                        fiftytwoHigh = ticker_info.get('fiftyTwoWeekHigh', 'N/A')
-                                        recommKey = ticker_info.get('recommendationKey', 'N/A')
-                                        meanTarget = ticker_info.get('targetMeanPrice', 'N/A')
-                                        lowTarget = ticker_info.get('targetLowPrice', 'N/A')
-                                        highTarget = ticker_info.get('targetHighPrice', 'N/A')
-                                        debtToEquity = ticker_info.get('debtToEquity', 'N/A')
-                                        totalDebt = ticker_info.get('totalDebt', 'N/A')
-                                        totalAsset = ticker_info.get('totalAssets', 'N/A')
-                                        marketCap = ticker_info.get('marketCap', 'N/A')
-                                        bookValue = ticker_info.get('bookValue', 'N/A')
-                                        totalRevenue = ticker_info.get('totalRevenue', 'N/A')
-                                        totalCash = ticker_info.get('totalCash', 'N/A')
-                                        operatingMargins = ticker_info.get('operatingMargins', 'N/A')
-                                        profitMargins = ticker_info.get('profitMargins', 'N/A')
-                                        revenueGrowth = ticker_info.get('revenueGrowth', 'N/A')
-                                        roe = ticker_info.get('returnOnEquity', 'N/A')
-                                        currentRatio = ticker_info.get('currentRatio', 'N/A')
-                                        quickRatio = ticker_info.get('quickRatio', 'N/A')
-                                        recommendationMean = ticker_info.get('recommendationMean', 'N/A')
-                                        sharesShort = ticker_info.get('sharesShort', 'N/A')
-                                        priceToBook = ticker_info.get('priceToBook', 'N/A')
-                                        trailingEps = ticker_info.get('trailingEps', 'N/A')
-                                        revPerEmployee = round(totalRevenue / fullTimeEmployees, 2) if fullTimeEmployees and totalRevenue else 'N/A'
-
-                                        recommendations = ticker_data.recommendations
-
-                                        st.markdown("<h2 style='color:#0E1B4A;'>재무 분석 보고서</h2>", unsafe_allow_html=True)
-                                        with st.container():
-                                            st.markdown(f"""
-                                            <div class='results-container'>
-                                                <h3>회사: {name}</h3>
-                                                <h4>비즈니스 요약</h4>
-                                                <p style='text-align:justify;'>{summary}</p>
-                                                <br>
-                                                <div class='company-metadata'>
-                                                    <h4>회사 메타 데이터</h4>
-                                                    {pd.DataFrame({
-                                                        '시가총액': [f'${marketCap:,}' if marketCap != 'N/A' else 'N/A'],
-                                                        '섹터': [sector],
-                                                        '산업': [industry],
-                                                        '전체 직원 수': [f'{fullTimeEmployees:,}' if fullTimeEmployees != 'N/A' else 'N/A'],
-                                                        '직원당 매출': [f'${revPerEmployee:,}' if revPerEmployee != 'N/A' else 'N/A']
-                                                    }).to_html(index=False, classes='dataframe')}
-                                                </div>
-                                                <hr><br>
-                                                <div class='financial-info'>
-                                                    <div style='display: flex; justify-content: space-between;'>
-                                                        <div style='width: 48%;'>
-                                                            <h4><strong>가격 정보</strong></h4>
-                                                            <p><strong>현재 가격:</strong>  {'${:,.2f}'.format(currentPrice) if currentPrice != 'N/A' else 'N/A'}</p>
-                                                            <p><strong>52주 최저가:</strong>  {'${:,.2f}'.format(fiftytwoLow) if fiftytwoLow != 'N/A' else 'N/A'}</p>
-                                                            <p><strong>52주 최고가:</strong>  {'${:,.2f}'.format(fiftytwoHigh) if fiftytwoHigh != 'N/A' else 'N/A'}</p>
-                                                        </div>
-                                                        <div style='width: 48%;'>
-                                                            <h4><strong>목표 가격</strong></h4>
-                                                            <p><strong>목표 평균 가격:</strong> {'${:,.2f}'.format(meanTarget) if meanTarget != 'N/A' else 'N/A'}</p>
-                                                            <p><strong>목표 최저 가격:</strong> {'${:,.2f}'.format(lowTarget) if lowTarget != 'N/A' else 'N/A'}</p>
-                                                            <p><strong>목표 최고 가격:</strong> {'${:,.2f}'.format(highTarget) if highTarget != 'N/A' else 'N/A'}</p>
-                                                        </div>
-                                                    </div>
-                                                    <h4><strong>추천:</strong> <strong style='color: #fafafa; border-radius: 4px; padding:2px 10px; background: skyblue; font-weight: 800;'>{recommKey}</strong></h4>
-                                                </div>
-                                                <hr><br>
-                                                <div class='financial-health'>
-                                                    <h4><strong>재무 상태</strong></h4>
-                                                    <div style='display: flex; justify-content: space-between;'>
-                                                        <div style='width: 48%;'>
-                                                            <p><strong>총 자산:</strong>  {'${:,.2f}'.format(totalAsset) if totalAsset != 'N/A' else 'N/A'}</p>
-                                                            <p><strong>총 부채:</strong>  {'${:,.2f}'.format(totalDebt) if totalDebt != 'N/A' else 'N/A'}</p>
-                                                            <p><strong>총 현금:</strong>  {'${:,.2f}'.format(totalCash) if totalCash != 'N/A' else 'N/A'}</p>
-                                                            <p><strong>장부가치:</strong>  {'${:,.2f}'.format(bookValue) if bookValue != 'N/A' else 'N/A'}</p>
-                                                            <p><strong>총 매출:</strong>  {'${:,.2f}'.format(totalRevenue) if totalRevenue != 'N/A' else 'N/A'}</p>
-                                                            <p><strong>매출 성장률:</strong> {revenueGrowth}</p>
-                                                            <p><strong>영업 이익률:</strong> {operatingMargins}</p>
-                                                            <p><strong>순이익률:</strong> {profitMargins}</p>
-                                                        </div>
-                                                        <div style='width: 48%;'>
-                                                            <p><strong>자기자본이익률:</strong> {roe}</p>
-                                                            <p><strong>현재 비율:</strong> {currentRatio}</p>
-                                                            <p><strong>당좌 비율:</strong> {quickRatio}</p>
-                                                            <p><strong>추천 평균:</strong> {recommendationMean}</p>
-                                                            <p><strong>공매도 주식:</strong> {sharesShort}</p>
-                                                            <p><strong>주가 대비 장부가:</strong> {priceToBook}</p>
-                                                            <p><strong>주당순이익:</strong> {trailingEps}</p>
-                                                        </div>
-                                                    </div>
-                                                </div>
-                                                <hr><br>
-                                                <div class='recommendations'>
-                                                    <h4><strong>총 추천 등급</strong></h4>
-                                                    {recommendations['To Grade'].value_counts().to_frame().to_html(index=True, classes='dataframe') if 'To Grade' in recommendations.columns else '추천 등급 정보를 사용할 수 없습니다.'}
-                                                </div>
-                                                <hr><br>
-                                                <div class='recent-news'>
-                                                    <h4><strong>최근 뉴스</strong></h4>
-                                                    {"<br>".join([f"{article['title']} (<a href='{article['link']}'>{article['link']}</a>)" for article in ticker_data.news[:3]])}
-                                                </div>
+                        ticker = pipeline_result['ticker']
+
+                        try:
+                            # 로컬 저장소/캐시를 우선 사용하고 부족한 yfinance 데이터만 동시에 가져오기
+                            market_report = get_market_report(ticker)
+                            ticker_info = market_report['info']
+
+                            name = ticker_info.get('longName', 'N/A')
+                            summary = get_first_four_sentences(ticker_info.get('longBusinessSummary', 'N/A'))
+                            fullTimeEmployees = ticker_info.get('fullTimeEmployees', 'N/A')
+                            industry = ticker_info.get('industry', 'N/A')
+                            sector = ticker_info.get('sector', 'N/A')
+                            currentPrice = ticker_info.get('currentPrice', 'N/A')
+                            openPrice = ticker_info.get('open', 'N/A')
+                            fiftytwoLow = ticker_info.get('fiftyTwoWeekLow', 'N/A')
+                            fiftytwoHigh = ticker_info.get('fiftyTwoWeekHigh', 'N/A')
+                            recommKey = ticker_info.get('recommendationKey', 'N/A')
+                            meanTarget = ticker_info.get('targetMeanPrice', 'N/A')
+                            lowTarget = ticker_info.get('targetLowPrice', 'N/A')
+                            highTarget = ticker_info.get('targetHighPrice', 'N/A')
+                            debtToEquity = ticker_info.get('debtToEquity', 'N/A')
+                            totalDebt = ticker_info.get('totalDebt', 'N/A')
+                            totalAsset = ticker_info.get('totalAssets', 'N/A')
+                            marketCap = ticker_info.get('marketCap', 'N/A')
+                            bookValue = ticker_info.get('bookValue', 'N/A')
+                            totalRevenue = ticker_info.get('totalRevenue', 'N/A')
+                            totalCash = ticker_info.get('totalCash', 'N/A')
+                            operatingMargins = ticker_info.get('operatingMargins', 'N/A')
+                            profitMargins = ticker_info.get('profitMargins', 'N/A')
+                            revenueGrowth = ticker_info.get('revenueGrowth', 'N/A')
+                            roe = ticker_info.get('returnOnEquity', 'N/A')
+                            currentRatio = ticker_info.get('currentRatio', 'N/A')
+                            quickRatio = ticker_info.get('quickRatio', 'N/A')
+                            recommendationMean = ticker_info.get('recommendationMean', 'N/A')
+                            sharesShort = ticker_info.get('sharesShort', 'N/A')
+                            priceToBook = ticker_info.get('priceToBook', 'N/A')
+                            trailingEps = ticker_info.get('trailingEps', 'N/A')
+                            revPerEmployee = round(totalRevenue / fullTimeEmployees, 2) if fullTimeEmployees and totalRevenue else 'N/A'
+
+                            recommendations = market_report['recommendations']
+
+                            st.markdown("<h2 style='color:#0E1B4A;'>재무 분석 보고서</h2>", unsafe_allow_html=True)
+                            with st.container():
+                                st.markdown(f"""
+                                <div class='results-container'>
+                                    <h3>회사: {name}</h3>
+                                    <h4>비즈니스 요약</h4>
+                                    <p style='text-align:justify;'>{summary}</p>
+                                    <br>
+                                    <div class='company-metadata'>
+                                        <h4>회사 메타 데이터</h4>
+                                        {pd.DataFrame({
+                                            '시가총액': [f'${marketCap:,}' if marketCap != 'N/A' else 'N/A'],
+                                            '섹터': [sector],
+                                            '산업': [industry],
+                                            '전체 직원 수': [f'{fullTimeEmployees:,}' if fullTimeEmployees != 'N/A' else 'N/A'],
+                                            '직원당 매출': [f'${revPerEmployee:,}' if revPerEmployee != 'N/A' else 'N/A']
+                                        }).to_html(index=False, classes='dataframe')}
+                                    </div>
+                                    <hr><br>
+                                    <div class='financial-info'>
+                                        <div style='display: flex; justify-content: space-between;'>
+                                            <div style='width: 48%;'>
+                                                <h4><strong>가격 정보</strong></h4>
+                                                <p><strong>현재 가격:</strong>  {'${:,.2f}'.format(currentPrice) if currentPrice != 'N/A' else 'N/A'}</p>
+                                                <p><strong>52주 최저가:</strong>  {'${:,.2f}'.format(fiftytwoLow) if fiftytwoLow != 'N/A' else 'N/A'}</p>
+                                                <p><strong>52주 최고가:</strong>  {'${:,.2f}'.format(fiftytwoHigh) if fiftytwoHigh != 'N/A' else 'N/A'}</p>
+                                            </div>
+                                            <div style='width: 48%;'>
+                                                <h4><strong>목표 가격</strong></h4>
+                                                <p><strong>목표 평균 가격:</strong> {'${:,.2f}'.format(meanTarget) if meanTarget != 'N/A' else 'N/A'}</p>
+                                                <p><strong>목표 최저 가격:</strong> {'${:,.2f}'.format(lowTarget) if lowTarget != 'N/A' else 'N/A'}</p>
+                                                <p><strong>목표 최고 가격:</strong> {'${:,.2f}'.format(highTarget) if highTarget != 'N/A' else 'N/A'}</p>
                                             </div>
-                                            """, unsafe_allow_html=True)
-
-                                        # 차트 데이터 표시
-                                        st.markdown("##### 종가 차트")
-                                        ticker_df = ticker_data.history(period='max')
-                                        st.line_chart(ticker_df['Close'])
-
-                                        st.markdown("##### 거래량 차트")
-                                        st.bar_chart(ticker_df['Volume'])
-
-                                        st.markdown("##### 재무제표")
-                                        income_statement = ticker_data.financials
-                                        st.write(income_statement)
-
-                                        st.markdown("##### 대차대조표")
-                                        balance_sheet = ticker_data.balance_sheet
-                                        st.write(balance_sheet)
-
-                                        st.markdown("##### 현금흐름표")
-                                        cashflow = ticker_data.cashflow
-                                        st.write(cashflow)
-
-                                    except Exception as e:
-                                        display_error(f"{ticker}에 대한 재무 데이터를 가져오는 데 실패했습니다: {str(e)}")
-                            else:
-                                # PDF 파일 업로드 및 RAG 보고서 생성
-                                if uploaded_file and pdf_text:
-                                    try:
-                                        with st.spinner('PDF 파일 처리 중...'):
-                                            rag_report = generate_rag_report(summary, pdf_text)
-                                            st.markdown("<h2 style='color:#0E1B4A;'>RAG 보고서</h2>", unsafe_allow_html=True)
-                                            st.markdown(rag_report, unsafe_allow_html=True)
-                                    except Exception as e:
-                                        display_error(f"PDF 파일 처리 중 오류 발생: {str(e)}")
+                                        </div>
+                                        <h4><strong>추천:</strong> <strong style='color: #fafafa; border-radius: 4px; padding:2px 10px; background: skyblue; font-weight: 800;'>{recommKey}</strong></h4>
+                                    </div>
+                                    <hr><br>
+                                    <div class='financial-health'>
+                                        <h4><strong>재무 상태</strong></h4>
+                                        <div style='display: flex; justify-content: space-between;'>
+                                            <div style='width: 48%;'>
+                                                <p><strong>총 자산:</strong>  {'${:,.2f}'.format(totalAsset) if totalAsset != 'N/A' else 'N/A'}</p>
+                                                <p><strong>총 부채:</strong>  {'${:,.2f}'.format(totalDebt) if totalDebt != 'N/A' else 'N/A'}</p>
+                                                <p><strong>총 현금:</strong>  {'${:,.2f}'.format(totalCash) if totalCash != 'N/A' else 'N/A'}</p>
+                                                <p><strong>장부가치:</strong>  {'${:,.2f}'.format(bookValue) if bookValue != 'N/A' else 'N/A'}</p>
+                                                <p><strong>총 매출:</strong>  {'${:,.2f}'.format(totalRevenue) if totalRevenue != 'N/A' else 'N/A'}</p>
+                                                <p><strong>매출 성장률:</strong> {revenueGrowth}</p>
+                                                <p><strong>영업 이익률:</strong> {operatingMargins}</p>
+                                                <p><strong>순이익률:</strong> {profitMargins}</p>
+                                            </div>
+                                            <div style='width: 48%;'>
+                                                <p><strong>자기자본이익률:</strong> {roe}</p>
+                                                <p><strong>현재 비율:</strong> {currentRatio}</p>
+                                                <p><strong>당좌 비율:</strong> {quickRatio}</p>
+                                                <p><strong>추천 평균:</strong> {recommendationMean}</p>
+                                                <p><strong>공매도 주식:</strong> {sharesShort}</p>
+                                                <p><strong>주가 대비 장부가:</strong> {priceToBook}</p>
+                                                <p><strong>주당순이익:</strong> {trailingEps}</p>
+                                            </div>
+                                        </div>
+                                    </div>
+                                    <hr><br>
+                                    <div class='recommendations'>
+                                        <h4><strong>총 추천 등급</strong></h4>
+                                        {recommendations['To Grade'].value_counts().to_frame().to_html(index=True, classes='dataframe') if 'To Grade' in recommendations.columns else '추천 등급 정보를 사용할 수 없습니다.'}
+                                    </div>
+                                    <hr><br>
+                                    <div class='recent-news'>
+                                        <h4><strong>최근 뉴스</strong></h4>
+                                        {"<br>".join([f"{article['title']} (<a href='{article['link']}'>{article['link']}</a>)" for article in market_report['news'][:3]])}
+                                    </div>
+                                </div>
+                                """, unsafe_allow_html=True)
+
+                            # 차트 데이터 표시 (구간별로 점 개수를 제한해 전송량을 일정하게 유지)
+                            ticker_df = market_report['history']
+                            for chart_range, tab in zip(CHART_RANGES, st.tabs(list(CHART_RANGES))):
+                                with tab:
+                                    chart_data = prepare_chart_data(ticker, ticker_df, chart_range)
+                                    st.markdown("##### 종가 차트")
+                                    st.line_chart(chart_data['close'])
+
+                                    st.markdown("##### 거래량 차트")
+                                    st.bar_chart(chart_data['volume'])
+
+                            st.markdown("##### 재무제표")
+                            income_statement = market_report['financials']
+                            st.write(income_statement)
+
+                            st.markdown("##### 대차대조표")
+                            balance_sheet = market_report['balance_sheet']
+                            st.write(balance_sheet)
+
+                            st.markdown("##### 현금흐름표")
+                            cashflow = market_report['cashflow']
+                            st.write(cashflow)
+
+                        except Exception as e:
+                            display_error(f"{ticker}에 대한 재무 데이터를 가져오는 데 실패했습니다: {str(e)}")
+                else:
+                    # PDF 파일 업로드 및 RAG 보고서 생성
+                    if uploaded_file and pdf_info:
+                        try:
+                            st.markdown("<h2 style='color:#0E1B4A;'>RAG 보고서</h2>", unsafe_allow_html=True)
+                            st.write_stream(generate_rag_report_stream(summary, source=pdf_info['source']))
+                        except Exception as e:
+                            display_error(f"PDF 파일 처리 중 오류 발생: {str(e)}")
+    display_timing(run)
 
 # 스타일 추가
 st.markdown("""
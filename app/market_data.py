@@ -0,0 +1,110 @@
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import yfinance as yf
+from cache import get_response_cache, make_key
+from tracing import stage, submit
+
+MARKET_DATA_DIR = os.getenv('MARKET_DATA_DIR', 'db/market/')
+# 저장된 가격 이력이 이 시간보다 최근에 갱신됐다면 네트워크 요청 없이 사용
+HISTORY_REFRESH_SECONDS = float(os.getenv('HISTORY_REFRESH_SECONDS', str(15 * 60)))
+INFO_TTL = float(os.getenv('MARKET_INFO_TTL', str(6 * 60 * 60)))
+RECOMMENDATIONS_TTL = float(os.getenv('MARKET_RECOMMENDATIONS_TTL', str(24 * 60 * 60)))
+NEWS_TTL = float(os.getenv('MARKET_NEWS_TTL', str(30 * 60)))
+STATEMENTS_TTL = float(os.getenv('MARKET_STATEMENTS_TTL', str(24 * 60 * 60)))
+
+# 서로 독립적인 yfinance 엔드포인트를 동시에 가져오기 위한 스레드 풀
+market_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="market")
+
+# yf.Ticker와 같은 인터페이스를 가진 객체를 만드는 함수 (벤치마크에서 로컬 대역으로 교체)
+ticker_factory = yf.Ticker
+
+def set_ticker_factory(factory):
+    global ticker_factory
+    ticker_factory = factory
+
+_history_locks = {}
+_history_locks_guard = threading.Lock()
+
+def history_path(ticker):
+    safe_ticker = re.sub(r'[^A-Za-z0-9._-]', '_', ticker)
+    return os.path.join(MARKET_DATA_DIR, f"{safe_ticker}.parquet")
+
+def _history_lock(ticker):
+    with _history_locks_guard:
+        return _history_locks.setdefault(ticker, threading.Lock())
+
+def _write_history(path, history):
+    # 쓰는 도중 읽히지 않도록 임시 파일에 쓴 뒤 교체
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    history.to_parquet(tmp_path)
+    os.replace(tmp_path, path)
+
+def load_price_history(ticker, ticker_data):
+    path = history_path(ticker)
+    with _history_lock(ticker):
+        stored = pd.read_parquet(path) if os.path.exists(path) else None
+        if stored is not None and not stored.empty:
+            if time.time() - os.path.getmtime(path) < HISTORY_REFRESH_SECONDS:
+                return stored
+            # 마지막 저장 봉(장중일 수 있음)부터 다시 받아 이후 데이터만 덧붙임
+            last_date = stored.index.max()
+            try:
+                fresh = ticker_data.history(start=last_date.strftime('%Y-%m-%d'))
+            except Exception as e:
+                # yfinance 장애/요청 제한 시 저장된 이력으로 차트를 그림 (다음 조회 때 다시 갱신 시도)
+                logging.warning(f"Using stored price history for {ticker}: {str(e)}")
+                return stored
+            if not fresh.empty:
+                history = pd.concat([stored[stored.index < fresh.index.min()], fresh])
+            else:
+                history = stored
+        else:
+            history = ticker_data.history(period='max')
+        if history.empty:
+            return history
+        _write_history(path, history)
+        return history
+
+def traced_price_history(ticker, ticker_data):
+    with stage("yfinance:history", ticker=ticker) as trace:
+        history = load_price_history(ticker, ticker_data)
+        trace["rows"] = len(history)
+        return history
+
+def cached_fetch(ticker, name, ttl, fetch):
+    with stage(f"yfinance:{name}", ticker=ticker) as trace:
+        cache = get_response_cache()
+        cache_key = make_key('market', ticker, name)
+        value = cache.get(cache_key)
+        trace["cache_hit"] = value is not None
+        if value is None:
+            value = fetch()
+            if value is not None:
+                cache.set(cache_key, value, ttl=ttl)
+        return value
+
+def get_market_report(ticker):
+    ticker_data = ticker_factory(ticker)
+    fetchers = {
+        "info": lambda: cached_fetch(ticker, "info", INFO_TTL, lambda: ticker_data.info),
+        "recommendations": lambda: cached_fetch(ticker, "recommendations", RECOMMENDATIONS_TTL, lambda: ticker_data.recommendations),
+        "news": lambda: cached_fetch(ticker, "news", NEWS_TTL, lambda: ticker_data.news),
+        "history": lambda: traced_price_history(ticker, ticker_data),
+        "financials": lambda: cached_fetch(ticker, "financials", STATEMENTS_TTL, lambda: ticker_data.financials),
+        "balance_sheet": lambda: cached_fetch(ticker, "balance_sheet", STATEMENTS_TTL, lambda: ticker_data.balance_sheet),
+        "cashflow": lambda: cached_fetch(ticker, "cashflow", STATEMENTS_TTL, lambda: ticker_data.cashflow)
+    }
+    futures = {name: submit(market_executor, fetch) for name, fetch in fetchers.items()}
+    try:
+        return {name: future.result() for name, future in futures.items()}
+    except Exception as e:
+        logging.error(f"Error in get_market_report for {ticker}: {str(e)}")
+        for future in futures.values():
+            future.cancel()
+        raise
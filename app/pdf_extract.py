@@ -0,0 +1,138 @@
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+PDF_BACKEND = os.getenv('PDF_BACKEND', 'pymupdf')
+# 이 페이지 수 이상이면 프로세스 풀에서 페이지 범위별로 나눠 추출
+PDF_PARALLEL_MIN_PAGES = int(os.getenv('PDF_PARALLEL_MIN_PAGES', '64'))
+PDF_PAGES_PER_TASK = int(os.getenv('PDF_PAGES_PER_TASK', '16'))
+PDF_WORKERS = int(os.getenv('PDF_WORKERS', str(min(4, os.cpu_count() or 1))))
+
+class PdfSource:
+    # 업로드된 PDF를 추출기에 넘기기 위한 래퍼
+    # 파일 경로는 MuPDF가 직접 열고(자체 매핑), BytesIO(Streamlit UploadedFile 포함)는 bytes로 넘김
+    # (PyMuPDF는 memoryview/mmap 스트림을 받지 않음)
+    def __init__(self, pdf_file):
+        self.file = pdf_file
+        self._spilled_path = None
+        if isinstance(pdf_file, (str, os.PathLike)):
+            self.path = os.fspath(pdf_file)
+            self.data = None
+        else:
+            self.path = None
+            if hasattr(pdf_file, 'getvalue'):
+                self.data = pdf_file.getvalue()
+            else:
+                pdf_file.seek(0)
+                self.data = pdf_file.read()
+
+    def open_document(self):
+        import fitz
+        if self.path is not None:
+            return fitz.open(self.path)
+        return fitz.open(stream=self.data, filetype="pdf")
+
+    def file_path(self):
+        # 작업 프로세스에는 바이트 대신 경로를 넘겨 각자 열게 함 (메모리 내 업로드는 한 번만 임시 파일로 기록)
+        if self.path is None and self._spilled_path is None:
+            with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+                f.write(self.data)
+                self._spilled_path = f.name
+        return self.path or self._spilled_path
+
+    def close(self):
+        self.data = None
+        if self._spilled_path is not None:
+            os.unlink(self._spilled_path)
+            self._spilled_path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def _extract_page_range(path, start, end):
+    # 작업 프로세스에서 실행됨
+    import fitz
+    with fitz.open(path) as document:
+        return [document[page_index].get_text() for page_index in range(start, end)]
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+def get_process_pool():
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            # torch 등이 스레드를 띄운 상태에서 fork하지 않도록 spawn 사용
+            _process_pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _process_pool
+
+class PyMuPdfBackend:
+    name = "pymupdf"
+
+    def __init__(self, parallel_min_pages=PDF_PARALLEL_MIN_PAGES, pages_per_task=PDF_PAGES_PER_TASK):
+        self.parallel_min_pages = parallel_min_pages
+        self.pages_per_task = pages_per_task
+
+    def page_count(self, source):
+        with source.open_document() as document:
+            return document.page_count
+
+    def iter_pages(self, source, total_pages):
+        if PDF_WORKERS > 1 and total_pages >= self.parallel_min_pages:
+            yield from self._iter_parallel(source, total_pages)
+            return
+        with source.open_document() as document:
+            for page_index in range(total_pages):
+                yield page_index + 1, document[page_index].get_text()
+
+    def _iter_parallel(self, source, total_pages):
+        path = source.file_path()
+        pool = get_process_pool()
+        ranges = deque((start, min(start + self.pages_per_task, total_pages)) for start in range(0, total_pages, self.pages_per_task))
+        pending = deque()
+        try:
+            # 순서대로 내보내되, 진행 중인 작업 수를 제한해 추출된 텍스트가 한꺼번에 쌓이지 않게 함
+            while ranges or pending:
+                while ranges and len(pending) < PDF_WORKERS * 2:
+                    start, end = ranges.popleft()
+                    pending.append((start, pool.submit(_extract_page_range, path, start, end)))
+                start, future = pending.popleft()
+                for offset, text in enumerate(future.result()):
+                    yield start + offset + 1, text
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+class PyPdf2Backend:
+    name = "pypdf2"
+
+    def _reader(self, source):
+        import PyPDF2
+        return PyPDF2.PdfReader(source.path or source.file)
+
+    def page_count(self, source):
+        return len(self._reader(source).pages)
+
+    def iter_pages(self, source, total_pages):
+        for page_num, page in enumerate(self._reader(source).pages, start=1):
+            yield page_num, page.extract_text() or ""
+
+BACKENDS = {backend.name: backend for backend in (PyMuPdfBackend, PyPdf2Backend)}
+
+def create_pdf_backend(name=PDF_BACKEND):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown PDF backend: {name}")
+    if name == "pymupdf":
+        try:
+            import fitz
+        except ImportError:
+            logging.error("PyMuPDF is not installed; falling back to PyPDF2")
+            return PyPdf2Backend()
+    return BACKENDS[name]()
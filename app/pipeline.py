@@ -0,0 +1,90 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from tracing import submit
+from utils import classify_steep_with_gpt, generate_search_query_with_gpt, parse_search_queries, analyze_with_gpt, analyze_with_gpt_stream, extract_and_explain_keywords, select_related_company
+from search import aggregate_search, build_search_context
+
+# 요약 이후 단계들을 병렬로 실행하기 위한 스레드 풀
+pipeline_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="pipeline")
+
+def format_results(results):
+    formatted_results = ""
+    for i, result in enumerate(results):
+        formatted_results += f"{i+1}. {result['title']} ({result['link']})<br><br>"
+    return formatted_results
+
+def build_combined_content(results):
+    # 화면에는 백엔드별 상위 결과를, 분석 프롬프트에는 융합 순위대로 토큰 예산만큼 담은 결과를 사용
+    google_scholar_content = format_results([result for result in results if "google_scholar" in result["backends"]][:3])
+    naver_news_content = format_results([result for result in results if "naver_news" in result["backends"]][:3])
+
+    google_scholar_content = google_scholar_content or "구글 스칼라에서 결과를 찾을 수 없습니다."
+    naver_news_content = naver_news_content or "네이버 뉴스에서 결과를 찾을 수 없습니다."
+
+    combined_content = build_search_context(results)
+    return google_scholar_content, naver_news_content, combined_content
+
+def get_content(response):
+    return response['choices'][0]['message']['content']
+
+def run_research_pipeline(summary, stream_analysis=False):
+    # 의존성 그래프:
+    #   summary -> (steep, query, keywords, ticker) 동시 실행
+    #   query -> aggregate_search (질의 변형 x 네 백엔드 병렬, 정족수/마감 시간) -> analysis
+    steep_future = submit(pipeline_executor, classify_steep_with_gpt, summary)
+    query_future = submit(pipeline_executor, generate_search_query_with_gpt, summary)
+    keywords_future = submit(pipeline_executor, extract_and_explain_keywords, summary)
+    company_future = submit(pipeline_executor, select_related_company, summary)
+
+    try:
+        search_query_response = query_future.result()
+        if "error" in search_query_response:
+            return {"error": search_query_response["error"]}
+        search_queries = parse_search_queries(get_content(search_query_response)) or [summary[:100]]
+        search_query = search_queries[0]
+
+        # 느리거나 실패한 백엔드가 있어도 정족수가 응답하면 진행하고, 아무 백엔드도 응답하지 않을 때만 실패
+        search = aggregate_search(search_queries)
+        if not search["answered"]:
+            return {"error": next(iter(search["errors"].values()), "검색 결과를 가져오지 못했습니다.")}
+
+        google_scholar_content, naver_news_content, combined_content = build_combined_content(search["results"])
+
+        if stream_analysis:
+            # 화면에서 토큰 단위로 그릴 수 있도록 분석은 생성기로 넘김
+            analysis = None
+            analysis_stream = analyze_with_gpt_stream(summary, combined_content)
+        else:
+            analysis_response = analyze_with_gpt(summary, combined_content)
+            if "error" in analysis_response:
+                return {"error": analysis_response["error"]}
+            analysis = get_content(analysis_response)
+            analysis_stream = None
+
+        steep_classification_response = steep_future.result()
+        if "error" in steep_classification_response:
+            return {"error": steep_classification_response["error"]}
+
+        company_response = company_future.result()
+        return {
+            "summary": summary,
+            "steep_classification": get_content(steep_classification_response).strip().lower(),
+            "search_query": search_query,
+            "search_queries": search_queries,
+            "search_missing": search["missing"],
+            "google_scholar_content": google_scholar_content,
+            "naver_news_content": naver_news_content,
+            "combined_content": combined_content,
+            "analysis": analysis,
+            "analysis_stream": analysis_stream,
+            "keywords": keywords_future.result(),
+            "ticker": None if "error" in company_response else get_content(company_response).strip(),
+            "ticker_error": company_response.get("error")
+        }
+    except Exception as e:
+        logging.error(f"Error in run_research_pipeline: {str(e)}")
+        return {"error": f"리서치 파이프라인 실행 중 오류 발생: {str(e)}"}
+    finally:
+        # 오류로 조기 종료한 경우 아직 시작하지 않은 작업은 취소
+        for future in (steep_future, keywords_future, company_future):
+            future.cancel()
@@ -0,0 +1,298 @@
+import contextvars
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from resources import get_resource
+from sqlite_store import SqliteStore
+
+# 제공자별 한도 (계정 등급에 맞게 환경 변수로 조정)
+OPENAI_RPM = float(os.getenv('OPENAI_RPM', '500'))
+OPENAI_TPM = float(os.getenv('OPENAI_TPM', '30000'))
+SERPAPI_RPS = float(os.getenv('SERPAPI_RPS', '5'))
+NAVER_RPS = float(os.getenv('NAVER_RPS', '10'))
+# 순간적으로 몰아 보낼 수 있는 양 (초 단위 한도). 작을수록 요청이 고르게 퍼짐
+RATE_LIMIT_BURST_SECONDS = float(os.getenv('RATE_LIMIT_BURST_SECONDS', '5'))
+# 한도는 이 파일을 함께 여는 모든 프로세스가 나눠 씀
+RATE_LIMIT_PATH = os.getenv('RATE_LIMIT_PATH', 'db/rate_limit.sqlite3')
+# 기다리는 동안 공유 상태를 다시 확인하는 최대 간격
+RATE_LIMIT_POLL_SECONDS = float(os.getenv('RATE_LIMIT_POLL_SECONDS', '0.05'))
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+
+_priority = contextvars.ContextVar('request_priority', default=PRIORITY_INTERACTIVE)
+
+def current_priority():
+    return _priority.get()
+
+@contextmanager
+def request_priority(priority):
+    # 이 블록(및 tracing.submit으로 넘긴 작업)에서 나가는 요청의 우선순위 지정
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+class RateLimitSkipped(RuntimeError):
+    pass
+
+class WaitScope:
+    # 함께 보내는 요청 묶음(예: 검색 fan-out)
+    # 첫 요청이 한도를 받은 시각을 기록하고, cancel() 뒤에도 한도를 기다리던 요청은 보내지 않음
+    def __init__(self):
+        self.cancelled = threading.Event()
+        self.first_granted = None
+
+    def granted(self):
+        if self.first_granted is None:
+            self.first_granted = time.monotonic()
+
+    def cancel(self):
+        self.cancelled.set()
+
+_wait_scope = contextvars.ContextVar('wait_scope', default=None)
+
+@contextmanager
+def wait_scope(scope):
+    # 이 블록(및 tracing.submit으로 넘긴 작업)에서 한도를 기다리는 요청을 scope에 묶음
+    token = _wait_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _wait_scope.reset(token)
+
+class TokenBucket:
+    def __init__(self, rate, capacity, tokens=None, updated=None):
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self.tokens = self.capacity if tokens is None else tokens
+        self.updated = time.time() if updated is None else updated
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + max(0.0, now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount, now):
+        # 용량보다 큰 요청은 용량만큼 차면 보내고 나머지는 빚으로 남김 (이후 요청이 그만큼 기다림)
+        self._refill(now)
+        needed = min(amount, self.capacity) - self.tokens
+        return max(0.0, needed / self.rate)
+
+    def take(self, amount):
+        self.tokens -= amount
+
+    def give(self, amount):
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+class SharedBuckets(SqliteStore):
+    # 버킷 상태를 SQLite 파일에 두어 같은 호스트의 모든 프로세스(Streamlit, 작업자 프로세스, batch.py)가
+    # 제공자 한도 하나를 나눠 씀. 읽기-수정-쓰기는 BEGIN IMMEDIATE로 프로세스 간에 직렬화
+    def __init__(self, path):
+        super().__init__(path, (
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "provider TEXT NOT NULL, kind TEXT NOT NULL, tokens REAL NOT NULL, updated REAL NOT NULL, PRIMARY KEY (provider, kind))",
+            "CREATE TABLE IF NOT EXISTS pauses (provider TEXT PRIMARY KEY, paused_until REAL NOT NULL)",
+            # 한도를 기다리는 프로세스가 남기는 표시. 더 낮은 우선순위의 요청은 이 표시가 살아 있는 동안 양보
+            "CREATE TABLE IF NOT EXISTS demand ("
+            "provider TEXT NOT NULL, priority INTEGER NOT NULL, pid INTEGER NOT NULL, waiting_until REAL NOT NULL, "
+            "PRIMARY KEY (provider, priority, pid))"
+        ))
+        # 한도 상태는 잃어도 되므로 커밋마다 fsync하지 않음
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+
+    @contextmanager
+    def transaction(self):
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield time.time()
+            except BaseException:
+                self.conn.rollback()
+                raise
+            self.conn.commit()
+
+    def _load(self, provider, limits, now):
+        rows = {
+            kind: (tokens, updated)
+            for kind, tokens, updated in self.conn.execute("SELECT kind, tokens, updated FROM buckets WHERE provider = ?", (provider,))
+        }
+        buckets = {}
+        for kind, rate in limits.items():
+            tokens, updated = rows.get(kind, (None, now))
+            buckets[kind] = TokenBucket(rate, rate * RATE_LIMIT_BURST_SECONDS, tokens, updated)
+        return buckets
+
+    def _save(self, provider, buckets):
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO buckets (provider, kind, tokens, updated) VALUES (?, ?, ?, ?)",
+            [(provider, kind, bucket.tokens, bucket.updated) for kind, bucket in buckets.items()]
+        )
+
+    def try_take(self, provider, limits, costs, priority):
+        # 지금 보낼 수 있으면 차감하고 0, 아니면 다시 시도하기까지 기다릴 시간
+        pid = os.getpid()
+        with self.transaction() as now:
+            row = self.conn.execute("SELECT paused_until FROM pauses WHERE provider = ?", (provider,)).fetchone()
+            delay = row[0] - now if row else 0.0
+            ahead = self.conn.execute(
+                "SELECT COUNT(*) FROM demand WHERE provider = ? AND priority < ? AND waiting_until > ?", (provider, priority, now)
+            ).fetchone()[0]
+            if ahead:
+                delay = max(delay, RATE_LIMIT_POLL_SECONDS)
+            buckets = self._load(provider, limits, now)
+            delay = max(delay, max((bucket.delay(costs.get(kind, 0), now) for kind, bucket in buckets.items()), default=0.0))
+            if delay > 0:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO demand (provider, priority, pid, waiting_until) VALUES (?, ?, ?, ?)",
+                    (provider, priority, pid, now + delay + RATE_LIMIT_POLL_SECONDS)
+                )
+                return delay
+            for kind, bucket in buckets.items():
+                bucket.take(costs.get(kind, 0))
+            self._save(provider, buckets)
+            self.conn.execute("DELETE FROM demand WHERE provider = ? AND priority = ? AND pid = ?", (provider, priority, pid))
+        return 0.0
+
+    def adjust(self, provider, limits, kind, amount):
+        # amount > 0이면 더 차감, < 0이면 돌려줌
+        with self.transaction() as now:
+            buckets = self._load(provider, {kind: limits[kind]}, now)
+            buckets[kind].delay(0, now)
+            if amount < 0:
+                buckets[kind].give(-amount)
+            else:
+                buckets[kind].take(amount)
+            self._save(provider, buckets)
+
+    def pause(self, provider, seconds):
+        with self.transaction() as now:
+            self.conn.execute(
+                "INSERT INTO pauses (provider, paused_until) VALUES (?, ?) "
+                "ON CONFLICT (provider) DO UPDATE SET paused_until = MAX(paused_until, excluded.paused_until)",
+                (provider, now + seconds)
+            )
+
+class RateLimiter:
+    # 제공자 하나의 버킷들(요청 수, 토큰 수)을 함께 관리
+    # 프로세스 안에서는 대기 중인 요청이 (우선순위, 도착 순서)로 한 줄로 서고 맨 앞 요청만 공유 버킷에서 꺼내감
+    def __init__(self, name, limits, store):
+        self.name = name
+        self.limits = limits
+        self.store = store
+        self.condition = threading.Condition()
+        self.waiters = []
+        self.sequence = itertools.count()
+        self.acquired = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.pauses = 0
+
+    def acquire(self, priority=None, **costs):
+        priority = current_priority() if priority is None else priority
+        ticket = (priority, next(self.sequence))
+        scope = _wait_scope.get()
+        started = time.monotonic()
+        with self.condition:
+            heapq.heappush(self.waiters, ticket)
+            try:
+                while True:
+                    if scope is not None and scope.cancelled.is_set():
+                        raise RateLimitSkipped(f"{self.name} request skipped while waiting for rate limit")
+                    # 묶음이 취소되는 것을 알아채도록 대기 중인 요청도 주기적으로 깨어남
+                    timeout = None if scope is None else RATE_LIMIT_POLL_SECONDS
+                    if self.waiters[0] == ticket:
+                        delay = self.store.try_take(self.name, self.limits, costs, priority)
+                        if delay <= 0:
+                            break
+                        # 다른 프로세스가 돌려주거나 멈춤을 거는 것을 놓치지 않도록 길게 자지 않음
+                        timeout = min(delay, RATE_LIMIT_POLL_SECONDS)
+                    self.condition.wait(timeout=timeout)
+            finally:
+                self.waiters.remove(ticket)
+                heapq.heapify(self.waiters)
+                self.condition.notify_all()
+            waited = time.monotonic() - started
+            self.acquired += 1
+            self.total_wait_time += waited
+            self.max_wait_time = max(self.max_wait_time, waited)
+        if scope is not None:
+            scope.granted()
+        return waited
+
+    def settle(self, kind, estimated, actual):
+        # 예상치로 미리 차감한 양을 실제 사용량에 맞춰 돌려주거나 더 차감
+        if kind not in self.limits or actual is None:
+            return
+        self.store.adjust(self.name, self.limits, kind, actual - estimated)
+        with self.condition:
+            self.condition.notify_all()
+
+    def pause(self, seconds):
+        # Retry-After 동안 모든 프로세스에서 이 제공자로의 요청을 멈춤
+        self.store.pause(self.name, seconds)
+        with self.condition:
+            self.pauses += 1
+            self.condition.notify_all()
+
+    def stats(self):
+        # 이 프로세스에서 보낸 요청 기준
+        with self.condition:
+            return {
+                "acquired": self.acquired,
+                "waiting": len(self.waiters),
+                "avg_wait_time": round(self.total_wait_time / self.acquired, 4) if self.acquired else 0.0,
+                "max_wait_time": round(self.max_wait_time, 4),
+                "pauses": self.pauses
+            }
+
+PROVIDER_LIMITS = {
+    "openai": {"requests": OPENAI_RPM / 60, "tokens": OPENAI_TPM / 60},
+    "serpapi": {"requests": SERPAPI_RPS},
+    "naver": {"requests": NAVER_RPS}
+}
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def get_shared_buckets():
+    return get_resource("rate_limit_buckets", lambda: SharedBuckets(RATE_LIMIT_PATH))
+
+def get_limiter(provider):
+    if provider not in PROVIDER_LIMITS:
+        return None
+    with _limiters_lock:
+        limiter = _limiters.get(provider)
+        if limiter is None:
+            limiter = RateLimiter(provider, PROVIDER_LIMITS[provider], get_shared_buckets())
+            _limiters[provider] = limiter
+        return limiter
+
+def limiter_stats():
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.stats() for limiter in limiters}
+
+def retry_after_seconds(headers):
+    # 초 단위 숫자, HTTP 날짜, 또는 OpenAI의 retry-after-ms
+    value = headers.get('retry-after-ms')
+    if value:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+    value = headers.get('retry-after')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,120 @@
+import logging
+import os
+import threading
+
+SUMMARIZER_MODEL = os.getenv('SUMMARIZER_MODEL', "KETI-AIR-Downstream/long-ke-t5-base-summarization")
+CHROMA_PERSIST_DIRECTORY = os.getenv('CHROMA_PERSIST_DIRECTORY', "db/")
+COLLECTION_NAME = "text_collection"
+GPT_MODEL = "gpt-4o"
+
+# 무거운 리소스(모델, 벡터 DB)는 처음 사용할 때 한 번만 만들고 프로세스 전체에서 공유
+_resources = {}
+_locks = {}
+_registry_lock = threading.Lock()
+
+def get_resource(name, factory):
+    resource = _resources.get(name)
+    if resource is not None:
+        return resource
+    with _registry_lock:
+        lock = _locks.setdefault(name, threading.Lock())
+    # 리소스별 잠금으로 동시에 첫 요청이 와도 한 번만 생성
+    with lock:
+        if name not in _resources:
+            _resources[name] = factory()
+        return _resources[name]
+
+def is_loaded(name):
+    return name in _resources
+
+def _load_tokenizer():
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(SUMMARIZER_MODEL)
+
+def _load_model():
+    from transformers import AutoModelForSeq2SeqLM
+    model = AutoModelForSeq2SeqLM.from_pretrained(SUMMARIZER_MODEL)
+    model.eval()
+    return model
+
+def _load_chroma_client():
+    import chromadb
+    from chromadb.config import Settings
+    return chromadb.Client(Settings(
+        chroma_db_impl="duckdb+parquet",
+        persist_directory=CHROMA_PERSIST_DIRECTORY
+    ))
+
+def get_tokenizer():
+    return get_resource("tokenizer", _load_tokenizer)
+
+def get_model():
+    return get_resource("model", _load_model)
+
+def get_summarizer_backend():
+    # SUMMARIZER_BACKEND 설정에 따라 torch / torch-int8 / onnx 중 하나를 생성
+    from inference import SUMMARIZER_BACKEND, create_backend
+    return get_resource("summarizer_backend", lambda: create_backend(SUMMARIZER_BACKEND, SUMMARIZER_MODEL, get_tokenizer(), get_model))
+
+def _load_gpt_encoding():
+    import tiktoken
+    try:
+        return tiktoken.encoding_for_model(GPT_MODEL)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+def get_gpt_encoding():
+    return get_resource("gpt_encoding", _load_gpt_encoding)
+
+def get_chroma_client():
+    return get_resource("chroma_client", _load_chroma_client)
+
+def _load_embedding_model():
+    from sentence_transformers import SentenceTransformer
+    from embeddings import EMBEDDING_MODEL
+    return SentenceTransformer(EMBEDDING_MODEL)
+
+def _load_embedding_function():
+    from embeddings import EMBEDDING_MODEL, EMBEDDING_CACHE_PATH, EmbeddingStore, CachedEmbeddingFunction
+    return CachedEmbeddingFunction(EMBEDDING_MODEL, EmbeddingStore(EMBEDDING_CACHE_PATH), get_embedding_model)
+
+def _load_collection():
+    from embeddings import EMBEDDING_MODEL_KEY, reembed_collection
+    client = get_chroma_client()
+    embedding_function = get_embedding_function()
+    try:
+        collection = client.get_collection(COLLECTION_NAME, embedding_function=embedding_function)
+    except Exception:
+        collection = client.create_collection(
+            COLLECTION_NAME,
+            metadata={EMBEDDING_MODEL_KEY: embedding_function.model_name},
+            embedding_function=embedding_function
+        )
+    reembed_collection(collection, embedding_function)
+    return collection
+
+def get_embedding_model():
+    return get_resource("embedding_model", _load_embedding_model)
+
+def get_embedding_function():
+    return get_resource("embedding_function", _load_embedding_function)
+
+def get_collection():
+    return get_resource("collection", _load_collection)
+
+def warmup(background=False, getters=None):
+    getters = getters or (get_tokenizer, get_summarizer_backend, get_collection)
+
+    def run():
+        for getter in getters:
+            try:
+                getter()
+            except Exception as e:
+                logging.error(f"Error in warmup ({getter.__name__}): {str(e)}")
+
+    if background:
+        thread = threading.Thread(target=run, name="warmup", daemon=True)
+        thread.start()
+        return thread
+    run()
+    return None
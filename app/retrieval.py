@@ -0,0 +1,62 @@
+import hashlib
+import os
+import re
+from tokens import pack_to_budget
+from tracing import stage
+
+RAG_TOP_K = int(os.getenv('RAG_TOP_K', '20'))
+RAG_CONTEXT_TOKENS = int(os.getenv('RAG_CONTEXT_TOKENS', '3000'))
+# 벡터 유사도에 더해 질의 단어가 청크에 얼마나 포함되는지를 반영하는 비율
+LEXICAL_WEIGHT = float(os.getenv('RAG_LEXICAL_WEIGHT', '0.3'))
+
+WORD_PATTERN = re.compile(r'\w+')
+
+def normalize_text(text):
+    return ' '.join(text.split()).lower()
+
+def term_coverage(query_terms, text):
+    if not query_terms:
+        return 0.0
+    text_terms = set(WORD_PATTERN.findall(text.lower()))
+    return len(query_terms & text_terms) / len(query_terms)
+
+def retrieve_chunks(collection, query, source=None, top_k=RAG_TOP_K):
+    count = collection.count()
+    if count == 0:
+        return []
+    query_kwargs = {"where": {"source": source}} if source else {}
+    with stage("chroma_query", top_k=top_k, filtered=bool(source)) as trace:
+        results = collection.query(
+            query_texts=[query],
+            n_results=min(top_k, count),
+            include=["documents", "metadatas", "distances"],
+            **query_kwargs
+        )
+        trace["results"] = len(results['ids'][0])
+    # query 결과는 질의별 리스트이므로 첫 번째 질의의 결과만 사용
+    documents = results['documents'][0]
+    metadatas = results['metadatas'][0]
+    distances = results['distances'][0]
+
+    query_terms = set(WORD_PATTERN.findall(query.lower()))
+    seen = set()
+    chunks = []
+    for document, metadata, distance in zip(documents, metadatas, distances):
+        digest = hashlib.sha256(normalize_text(document).encode('utf-8')).hexdigest()
+        if digest in seen:
+            continue
+        seen.add(digest)
+        score = 1 / (1 + distance) + LEXICAL_WEIGHT * term_coverage(query_terms, document)
+        chunks.append({"text": document, "metadata": metadata or {}, "distance": distance, "score": score})
+    chunks.sort(key=lambda chunk: chunk["score"], reverse=True)
+    return chunks
+
+def format_chunk(chunk):
+    metadata = chunk["metadata"]
+    if "page" in metadata:
+        return f"[{metadata.get('source', '')} p.{metadata['page']}]\n{chunk['text']}"
+    return chunk["text"]
+
+def build_context(chunks, budget=RAG_CONTEXT_TOKENS):
+    # 점수가 높은 청크부터 토큰 예산 안에 담아 프롬프트 크기를 제한
+    return "\n\n".join(pack_to_budget([format_chunk(chunk) for chunk in chunks], budget))
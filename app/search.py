@@ -0,0 +1,159 @@
+import html
+import logging
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from rate_limit import WaitScope, wait_scope, current_priority, PRIORITY_BATCH, RATE_LIMIT_POLL_SECONDS
+from tokens import pack_to_budget
+from tracing import stage, submit
+from utils import search_google_scholar, search_naver_news, search_google, search_naver
+
+# 질의 변형 수 x 백엔드 수만큼 동시에 요청
+SEARCH_BACKENDS = {
+    "google_scholar": search_google_scholar,
+    "naver_news": search_naver_news,
+    "google": search_google,
+    "naver": search_naver
+}
+# 이 수 이상의 백엔드가 응답하면 나머지는 SEARCH_QUORUM_GRACE만 더 기다림
+SEARCH_QUORUM = int(os.getenv('SEARCH_QUORUM', '3'))
+SEARCH_QUORUM_GRACE = float(os.getenv('SEARCH_QUORUM_GRACE', '0.3'))
+# 정족수와 관계없이 이 시간이 지나면 도착한 결과만으로 진행 (batch.py 등 배치 우선순위는 SEARCH_BATCH_DEADLINE)
+SEARCH_DEADLINE = float(os.getenv('SEARCH_DEADLINE', '5'))
+SEARCH_BATCH_DEADLINE = float(os.getenv('SEARCH_BATCH_DEADLINE', '30'))
+# 어떤 요청도 제공자 한도를 받지 못한 채 이 시간이 지나면 포기
+SEARCH_QUEUE_TIMEOUT = float(os.getenv('SEARCH_QUEUE_TIMEOUT', '30'))
+SEARCH_CONTEXT_TOKENS = int(os.getenv('SEARCH_CONTEXT_TOKENS', '1000'))
+RRF_K = 60
+
+search_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="search")
+
+TAG_PATTERN = re.compile(r'<[^>]+>')
+NON_WORD_PATTERN = re.compile(r'[^\w]+')
+TRACKING_PARAMS = ('utm_', 'fbclid', 'gclid')
+
+def clean_text(text):
+    # 네이버 API는 제목에 <b> 태그와 HTML 엔티티를 넣어 보냄
+    return html.unescape(TAG_PATTERN.sub('', text or '')).strip()
+
+def normalize_url(url):
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    query = urlencode(sorted((key, value) for key, value in parse_qsl(parts.query) if not key.startswith(TRACKING_PARAMS)))
+    return urlunsplit(('', host, parts.path.rstrip('/'), query, ''))
+
+def normalize_title(title):
+    return NON_WORD_PATTERN.sub(' ', clean_text(title).lower()).strip()
+
+def extract_results(backend, response):
+    items = response.get('organic_results') or response.get('items') or []
+    results = []
+    for item in items:
+        link = item.get('originallink') or item.get('link')
+        title = clean_text(item.get('title'))
+        if not link or not title:
+            continue
+        results.append({
+            "title": title,
+            "link": link,
+            "snippet": clean_text(item.get('snippet') or item.get('description')),
+            "backend": backend
+        })
+    return results
+
+def fan_out(queries, deadline=None, quorum=SEARCH_QUORUM, grace=SEARCH_QUORUM_GRACE, queue_timeout=SEARCH_QUEUE_TIMEOUT):
+    # 모든 (백엔드, 질의) 조합을 동시에 요청하고, 정족수/마감 시간에 도달하면 도착한 것만 반환
+    # 마감 시간은 첫 요청이 제공자 한도를 받았을 때부터 셈 (한도 대기 시간은 제외)
+    if deadline is None:
+        deadline = SEARCH_BATCH_DEADLINE if current_priority() >= PRIORITY_BATCH else SEARCH_DEADLINE
+    scope = WaitScope()
+    with wait_scope(scope):
+        futures = {
+            submit(search_executor, fetch, query): (backend, query_index)
+            for query_index, query in enumerate(queries)
+            for backend, fetch in SEARCH_BACKENDS.items()
+        }
+    queued = time.monotonic()
+    cutoff = None
+    responses = []
+    answered = set()
+    errors = {}
+    pending = set(futures)
+    while pending:
+        now = time.monotonic()
+        if cutoff is None and (scope.first_granted is not None or len(pending) < len(futures)):
+            # 캐시 적중은 한도를 받지 않고 끝나므로 첫 완료 시점도 시작으로 봄
+            cutoff = (scope.first_granted or now) + deadline
+        if cutoff is None:
+            if now - queued >= queue_timeout:
+                break
+            # 아직 어떤 요청도 한도를 받지 못함: 짧게 기다리며 시작 시점을 확인
+            timeout = RATE_LIMIT_POLL_SECONDS
+        else:
+            timeout = cutoff - now
+            if timeout <= 0:
+                break
+        done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            backend, query_index = futures[future]
+            try:
+                response = future.result()
+            except Exception as e:
+                response = {"error": str(e)}
+            if "error" in response:
+                errors.setdefault(backend, response["error"])
+                continue
+            answered.add(backend)
+            responses.append((backend, query_index, response))
+        if cutoff is not None and len(answered) >= min(quorum, len(SEARCH_BACKENDS)):
+            cutoff = min(cutoff, time.monotonic() + grace)
+    # 아직 한도를 기다리는 요청은 보내지 않음 (이미 보낸 요청은 끝까지 실행되어 캐시에 남음)
+    scope.cancel()
+    for future in pending:
+        future.cancel()
+    missing = sorted(set(SEARCH_BACKENDS) - answered)
+    return responses, answered, missing, errors
+
+def rrf_merge(responses, k=RRF_K):
+    # 각 (백엔드, 질의) 결과 목록의 순위를 reciprocal rank fusion으로 합치고 URL/제목 기준으로 중복 제거
+    merged = {}
+    title_index = {}
+    for backend, query_index, response in responses:
+        for rank, result in enumerate(extract_results(backend, response), start=1):
+            url_key = normalize_url(result["link"])
+            title_key = normalize_title(result["title"])
+            key = title_index.get(title_key, url_key) if title_key else url_key
+            entry = merged.get(key)
+            if entry is None:
+                entry = merged[key] = dict(result, score=0.0, backends=set())
+            if title_key:
+                title_index.setdefault(title_key, key)
+            entry["score"] += 1 / (k + rank)
+            entry["backends"].add(backend)
+            if not entry["snippet"] and result["snippet"]:
+                entry["snippet"] = result["snippet"]
+    ranked = sorted(merged.values(), key=lambda entry: entry["score"], reverse=True)
+    for entry in ranked:
+        entry["backends"] = sorted(entry["backends"])
+    return ranked
+
+def aggregate_search(queries):
+    with stage("search_aggregate", queries=len(queries)) as trace:
+        responses, answered, missing, errors = fan_out(queries)
+        results = rrf_merge(responses)
+        trace.update(answered=len(answered), missing=",".join(missing), results=len(results))
+    if missing:
+        logging.warning(f"Search continued without {missing}: {errors}")
+    return {"results": results, "answered": sorted(answered), "missing": missing, "errors": errors}
+
+def format_result(result):
+    line = f"- {result['title']} ({result['link']})"
+    return f"{line}\n  {result['snippet']}" if result["snippet"] else line
+
+def build_search_context(results, budget=SEARCH_CONTEXT_TOKENS):
+    # 점수가 높은 결과부터 토큰 예산 안에 담음
+    return "\n".join(pack_to_budget([format_result(result) for result in results], budget, separator="\n"))
@@ -0,0 +1,48 @@
+import os
+import sqlite3
+import threading
+
+# 이 횟수만큼 쓴 뒤에 한 번씩 크기 상한을 확인
+EVICT_EVERY_WRITES = 100
+
+def connect(path):
+    # 여러 스레드/프로세스가 같은 파일을 함께 쓰므로 WAL 모드로 연결
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+class SqliteStore:
+    # 응답 캐시, 임베딩 캐시, 중복 색인 등이 공유하는 SQLite 연결/잠금/정리 로직
+    def __init__(self, path, schema=()):
+        self.path = path
+        self.lock = threading.Lock()
+        self.writes_since_evict = 0
+        self.conn = connect(path)
+        for statement in schema:
+            self.conn.execute(statement)
+        self.conn.commit()
+
+    def wrote(self):
+        # 매번 COUNT를 하지 않도록 일정 횟수 쓰기마다 정리 (self.lock을 잡은 상태에서 호출)
+        self.writes_since_evict += 1
+        if self.writes_since_evict >= EVICT_EVERY_WRITES:
+            self.writes_since_evict = 0
+            self.evict()
+
+    def evict(self):
+        pass
+
+    def evict_least_recent(self, table, key, max_entries, dependents=()):
+        # 상한을 넘은 만큼 accessed_at이 가장 오래된 행부터 제거
+        # dependents: 함께 지울 (테이블, 참조 열) 목록
+        count = self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        overflow = max(0, count - max_entries)
+        if overflow:
+            stale = f"SELECT {key} FROM {table} ORDER BY accessed_at LIMIT ?"
+            for dependent, column in dependents:
+                self.conn.execute(f"DELETE FROM {dependent} WHERE {column} IN ({stale})", (overflow,))
+            self.conn.execute(f"DELETE FROM {table} WHERE {key} IN ({stale})", (overflow,))
+        return overflow
@@ -0,0 +1,159 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import inference
+from resources import get_tokenizer, get_model, get_summarizer_backend
+
+MAX_INPUT_TOKENS = 1024
+SUMMARY_BATCH_SIZE = int(os.getenv('SUMMARY_BATCH_SIZE', '8'))
+SUMMARY_BATCH_WAIT_MS = float(os.getenv('SUMMARY_BATCH_WAIT_MS', '25'))
+SUMMARY_WINDOW_TOKENS = int(os.getenv('SUMMARY_WINDOW_TOKENS', str(MAX_INPUT_TOKENS)))
+SUMMARY_WINDOW_OVERLAP = int(os.getenv('SUMMARY_WINDOW_OVERLAP', '128'))
+# 창이 겹치지 않는 부분(step)이 요약 최대 길이의 이 배수 이상이어야 reduce 단계마다 입력이 확실히 줄어듦
+MIN_WINDOW_REDUCTION = 2
+
+def generate_summaries(batch_input_ids):
+    # 배치 내 가장 긴 입력까지만 패딩하고 attention mask로 패딩 토큰을 가림 (백엔드에서 처리)
+    summary_ids = get_summarizer_backend().generate(batch_input_ids)
+    return get_tokenizer().batch_decode(summary_ids, skip_special_tokens=True)
+
+def summarize_batch(texts, batch_size=SUMMARY_BATCH_SIZE):
+    if not texts:
+        return []
+    input_ids = get_tokenizer()(list(texts), max_length=MAX_INPUT_TOKENS, truncation=True)['input_ids']
+    # 길이순으로 정렬해 비슷한 길이의 입력끼리 묶어 패딩 낭비를 줄임
+    order = sorted(range(len(input_ids)), key=lambda i: len(input_ids[i]))
+    summaries = [None] * len(input_ids)
+    for start in range(0, len(order), batch_size):
+        indices = order[start:start + batch_size]
+        decoded = generate_summaries([input_ids[i] for i in indices])
+        for i, summary in zip(indices, decoded):
+            summaries[i] = summary
+    return summaries
+
+def validate_window(window, overlap):
+    summary_tokens = inference.GENERATE_KWARGS['max_length']
+    if not 0 <= overlap < window - 1:
+        raise ValueError("overlap must be smaller than window - 1")
+    if window - 1 - overlap < MIN_WINDOW_REDUCTION * summary_tokens:
+        raise ValueError(
+            f"window - 1 - overlap ({window - 1 - overlap}) must be at least {MIN_WINDOW_REDUCTION}x "
+            f"the summary max_length ({summary_tokens}) so that each reduce level shrinks the input"
+        )
+
+validate_window(SUMMARY_WINDOW_TOKENS, SUMMARY_WINDOW_OVERLAP)
+
+def split_windows(token_ids, window, overlap):
+    # EOS를 붙일 자리를 남기고 겹치는 토큰 창으로 분할
+    validate_window(window, overlap)
+    eos_token_id = get_tokenizer().eos_token_id
+    size = window - 1
+    step = size - overlap
+    windows = []
+    for start in range(0, max(len(token_ids) - overlap, 1), step):
+        windows.append(token_ids[start:start + size] + [eos_token_id])
+    return windows
+
+def iter_summarize_long(text, window=SUMMARY_WINDOW_TOKENS, overlap=SUMMARY_WINDOW_OVERLAP, batch_size=SUMMARY_BATCH_SIZE):
+    # 계층적 요약: 창별 요약(map) -> 부분 요약을 이어 붙여 다시 요약(reduce)
+    # 창 배치가 끝날 때마다 부분 결과를 이벤트로 내보냄
+    tokenizer = get_tokenizer()
+    token_ids = tokenizer(text, add_special_tokens=False)['input_ids']
+    level = 0
+    while len(token_ids) >= window:
+        windows = split_windows(token_ids, window, overlap)
+        partials = []
+        for start in range(0, len(windows), batch_size):
+            for summary in generate_summaries(windows[start:start + batch_size]):
+                partials.append(summary)
+                yield {"stage": "map", "level": level, "window": len(partials), "total": len(windows), "summary": summary}
+        reduced = tokenizer("\n".join(partials), add_special_tokens=False)['input_ids']
+        level += 1
+        if len(reduced) >= len(token_ids):
+            # 요약이 입력보다 줄지 않으면 끝나지 않으므로 한 창 분량만 남기고 최종 요약
+            logging.warning(f"Summary reduce level {level} did not shrink the input ({len(token_ids)} -> {len(reduced)} tokens); truncating")
+            token_ids = token_ids[:window - 1]
+            break
+        token_ids = reduced
+    final = generate_summaries([token_ids + [tokenizer.eos_token_id]])[0]
+    yield {"stage": "final", "level": level, "window": 1, "total": 1, "summary": final}
+
+def summarize_long(text, window=SUMMARY_WINDOW_TOKENS, overlap=SUMMARY_WINDOW_OVERLAP):
+    summary = None
+    for event in iter_summarize_long(text, window, overlap):
+        summary = event["summary"]
+    return summary
+
+def needs_long_summary(text, window=SUMMARY_WINDOW_TOKENS):
+    return len(get_tokenizer()(text, add_special_tokens=False)['input_ids']) >= window
+
+def summarize_texts(texts, batch_size=SUMMARY_BATCH_SIZE):
+    # 짧은 글은 한꺼번에 배치 요약하고, 창 크기를 넘는 글만 map-reduce 요약
+    summaries = [None] * len(texts)
+    short_indices = []
+    for i, text in enumerate(texts):
+        if needs_long_summary(text):
+            summaries[i] = summarize_long(text)
+        else:
+            short_indices.append(i)
+    for i, summary in zip(short_indices, summarize_batch([texts[i] for i in short_indices], batch_size)):
+        summaries[i] = summary
+    return summaries
+
+def check_backend_parity(texts):
+    # 설정된 백엔드의 출력을 PyTorch fp32 결과와 비교
+    tokenizer = get_tokenizer()
+    reference = inference.TorchBackend(get_model(), tokenizer.pad_token_id)
+    return inference.check_parity(get_summarizer_backend(), reference, tokenizer, texts, MAX_INPUT_TOKENS)
+
+class MicroBatcher:
+    # 여러 세션에서 동시에 들어온 요약 요청을 짧은 대기 시간 동안 모아 한 번의 forward로 처리
+    def __init__(self, batch_fn, max_batch_size=SUMMARY_BATCH_SIZE, max_wait_ms=SUMMARY_BATCH_WAIT_MS):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def submit(self, item):
+        future = Future()
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="summary-batcher", daemon=True)
+                self.thread.start()
+        self.queue.put((item, future))
+        return future
+
+    def _collect(self):
+        items = [self.queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(items) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                items.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return [(item, future) for item, future in items if future.set_running_or_notify_cancel()]
+
+    def _run(self):
+        while True:
+            items = self._collect()
+            if not items:
+                continue
+            try:
+                results = self.batch_fn([item for item, _ in items])
+            except Exception as e:
+                logging.error(f"Error in MicroBatcher: {str(e)}")
+                for _, future in items:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(items, results):
+                future.set_result(result)
+
+summary_batcher = MicroBatcher(summarize_batch)
@@ -0,0 +1,26 @@
+from resources import get_gpt_encoding
+
+def count_tokens(text):
+    return len(get_gpt_encoding().encode(text))
+
+def truncate_to_tokens(text, max_tokens):
+    encoding = get_gpt_encoding()
+    tokens = encoding.encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+def pack_to_budget(texts, budget, separator="\n\n"):
+    # 우선순위 순으로 주어진 텍스트를 토큰 예산 안에 들어가는 만큼 담음
+    # 들어가지 않는 항목은 건너뛰고, 아무것도 못 담았다면 첫 항목을 잘라서라도 포함
+    selected = []
+    used = 0
+    separator_tokens = count_tokens(separator)
+    for text in texts:
+        cost = count_tokens(text) + (separator_tokens if selected else 0)
+        if used + cost <= budget:
+            selected.append(text)
+            used += cost
+    if not selected and texts:
+        selected.append(truncate_to_tokens(texts[0], budget))
+    return selected
@@ -0,0 +1,143 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager, nullcontext
+
+STAGE_WINDOW = int(os.getenv('STAGE_WINDOW', '500'))
+
+# OpenTelemetry가 설치되어 있으면 각 단계를 span으로도 내보냄
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:
+    otel_trace = None
+
+_current_run = contextvars.ContextVar('current_run', default=None)
+_stage_durations = defaultdict(lambda: deque(maxlen=STAGE_WINDOW))
+_stage_lock = threading.Lock()
+_otel_configured = False
+
+def configure_otel():
+    # OTEL_EXPORTER_OTLP_ENDPOINT가 있으면 OTLP로, OTEL_TRACES_CONSOLE=1이면 콘솔로 내보냄
+    global _otel_configured
+    if _otel_configured or otel_trace is None:
+        return
+    _otel_configured = True
+    try:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+        provider = TracerProvider(resource=Resource.create({"service.name": os.getenv('OTEL_SERVICE_NAME', 'summarizer')}))
+        if os.getenv('OTEL_EXPORTER_OTLP_ENDPOINT'):
+            from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+            provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+        elif os.getenv('OTEL_TRACES_CONSOLE') == '1':
+            provider.add_span_processor(BatchSpanProcessor(ConsoleSpanExporter()))
+        else:
+            return
+        otel_trace.set_tracer_provider(provider)
+    except Exception as e:
+        logging.error(f"Error in configure_otel: {str(e)}")
+
+def _tracer():
+    return otel_trace.get_tracer("summarizer") if otel_trace else None
+
+class Run:
+    # 한 번의 파이프라인 실행 동안 기록된 단계들 (타이밍 폭포 차트용)
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        # 다른 프로세스에서 기록된 단계와 시간축을 맞추기 위한 벽시계 기준
+        self.wall_started = time.time()
+        self.stages = []
+        self.lock = threading.Lock()
+
+    def add(self, name, started, duration, attributes):
+        with self.lock:
+            self.stages.append({
+                "stage": name,
+                "start": round(started - self.started, 4),
+                "end": round(started - self.started + duration, 4),
+                "duration": round(duration, 4),
+                "thread": threading.current_thread().name,
+                **attributes
+            })
+
+    def merge(self, timeline, wall_started, record=True):
+        # 작업자 프로세스 등 다른 Run의 단계를 이 실행의 시간축으로 옮겨 합침
+        offset = wall_started - self.wall_started
+        with self.lock:
+            for entry in timeline:
+                self.stages.append(dict(entry, start=round(entry["start"] + offset, 4), end=round(entry["end"] + offset, 4)))
+        if not record:
+            return
+        with _stage_lock:
+            for entry in timeline:
+                _stage_durations[entry["stage"]].append(entry["duration"])
+
+    def timeline(self):
+        with self.lock:
+            return sorted(self.stages, key=lambda item: item["start"])
+
+def current_run():
+    return _current_run.get()
+
+@contextmanager
+def start_run(name):
+    run = Run(name)
+    token = _current_run.set(run)
+    tracer = _tracer()
+    try:
+        with tracer.start_as_current_span(name) if tracer else nullcontext():
+            yield run
+    finally:
+        _current_run.reset(token)
+
+def record_stage(name, started, duration, attributes=None):
+    attributes = attributes or {}
+    with _stage_lock:
+        _stage_durations[name].append(duration)
+    run = _current_run.get()
+    if run is not None:
+        run.add(name, started, duration, attributes)
+
+@contextmanager
+def stage(name, **attributes):
+    # 호출자는 넘겨받은 dict에 bytes, tokens, cache_hit 등을 채워 넣을 수 있음
+    tracer = _tracer()
+    started = time.perf_counter()
+    with tracer.start_as_current_span(name) if tracer else nullcontext() as span:
+        try:
+            yield attributes
+        except BaseException:
+            attributes["error"] = True
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            record_stage(name, started, duration, attributes)
+            if span is not None:
+                for key, value in attributes.items():
+                    if isinstance(value, (str, bool, int, float)):
+                        span.set_attribute(key, value)
+
+def submit(executor, fn, *args, **kwargs):
+    # 실행 중인 Run과 OTel 컨텍스트를 작업자 스레드로 전달
+    context = contextvars.copy_context()
+    return executor.submit(context.run, fn, *args, **kwargs)
+
+def percentile(values, q):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+def stage_percentiles():
+    with _stage_lock:
+        snapshot = {name: list(durations) for name, durations in _stage_durations.items()}
+    return {
+        name: {"count": len(durations), "p50": round(percentile(durations, 0.5), 4), "p95": round(percentile(durations, 0.95), 4)}
+        for name, durations in sorted(snapshot.items()) if durations
+    }
+
+configure_otel()
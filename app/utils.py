@@ -1,12 +1,19 @@
-import requests
 import os
+import re
+import json
+import time
+import httpx
 from dotenv import load_dotenv
 import logging
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
-import torch
-import PyPDF2
-import chromadb
-from chromadb.config import Settings
+import http_client
+from cache import get_response_cache, make_key, SEARCH_CACHE_TTL
+from summarizer import summary_batcher, iter_summarize_long, needs_long_summary
+from ingest import ingest_pdf, ingest_text
+from resources import get_collection, GPT_MODEL
+from retrieval import retrieve_chunks, build_context
+from tracing import stage
+from tokens import count_tokens
+from rate_limit import get_limiter
 
 # 로깅 설정
 logging.basicConfig(level=logging.ERROR, filename='app_errors.log')
@@ -14,62 +21,88 @@ logging.basicConfig(level=logging.ERROR, filename='app_errors.log')
 # 환경 변수 로드
 load_dotenv()
 
-# 환경 변수에서 API 키 가져오기
-GPT_API_KEY = os.getenv('GPT4_API_KEY')
-SERP_API_KEY = os.getenv('SERP_API_KEY')
-NAVER_CLIENT_ID = os.getenv('NAVER_CLIENT_ID')
-NAVER_CLIENT_SECRET = os.getenv('NAVER_CLIENT_SECRET')
+# 환경 변수에서 API 키 가져오기 (실제로 필요한 호출에서만 확인)
+def get_api_key(name):
+    value = os.getenv(name)
+    if not value:
+        raise ValueError(f"Environment variable {name} is missing.")
+    return value
 
-if not all([GPT_API_KEY, SERP_API_KEY, NAVER_CLIENT_ID, NAVER_CLIENT_SECRET]):
-    raise ValueError("One or more environment variables are missing.")
+# 외부 API 주소 (벤치마크/테스트에서는 로컬 대역 서버로 바꿀 수 있음)
+SERP_API_URL = os.getenv('SERP_API_URL', 'https://serpapi.com/search.json')
+NAVER_API_URL = os.getenv('NAVER_API_URL', 'https://openapi.naver.com/v1/search/news.json')
+OPENAI_API_BASE = os.getenv('OPENAI_API_BASE', 'https://api.openai.com/v1')
+GPT_API_URL = f"{OPENAI_API_BASE.rstrip('/')}/chat/completions"
 
-SERP_API_URL = 'https://serpapi.com/search.json'
-NAVER_API_URL = 'https://openapi.naver.com/v1/search/news.json'
+def gpt_cost(prompt, system_message, max_tokens):
+    # 요청 전에 토큰 한도에서 차감할 양: 프롬프트 길이 + 최대 생성 길이 (응답 후 실제 사용량으로 보정)
+    return {"requests": 1, "tokens": count_tokens(system_message) + count_tokens(prompt) + max_tokens}
 
-# 모델 및 토크나이저 로드
-tokenizer = AutoTokenizer.from_pretrained("KETI-AIR-Downstream/long-ke-t5-base-summarization")
-model = AutoModelForSeq2SeqLM.from_pretrained("KETI-AIR-Downstream/long-ke-t5-base-summarization")
+def search_provider(url):
+    return "naver" if url == NAVER_API_URL else "serpapi"
 
-# ChromaDB 초기화
-chroma_client = chromadb.Client(Settings(
-    chroma_db_impl="duckdb+parquet",
-    persist_directory="db/"
-))
-collection = chroma_client.get_or_create_collection("text_collection")
+# 검색 질의 변형 수 (search.aggregate_search가 질의 x 백엔드를 동시에 요청)
+SEARCH_QUERY_VARIANTS = int(os.getenv('SEARCH_QUERY_VARIANTS', '3'))
 
 def summarize_news(news_text):
-    try:
-        inputs = tokenizer(news_text, return_tensors="pt", max_length=1024, truncation=True, padding="max_length")
-        summary_ids = model.generate(inputs['input_ids'], max_length=150, min_length=40, length_penalty=2.0, num_beams=4, early_stopping=True)
-        summary = tokenizer.decode(summary_ids[0], skip_special_tokens=True)
-        return summary
-    except Exception as e:
-        logging.error(f"Error in summarize_news: {str(e)}")
-        return None
+    summary = None
+    for event in iter_summarize_news(news_text):
+        summary = event["summary"]
+    return summary
 
-def generate_search_query_with_gpt(summary):
+def iter_summarize_news(news_text):
+    with stage("summarize_news", chars=len(news_text)) as trace:
+        try:
+            if needs_long_summary(news_text):
+                # 긴 문서는 잘라내지 않고 창 단위 map-reduce 요약
+                trace["long"] = True
+                yield from iter_summarize_long(news_text)
+            else:
+                # 동시에 들어온 다른 요청과 함께 배치 처리됨
+                summary = summary_batcher.submit(news_text).result()
+                yield {"stage": "final", "level": 0, "window": 1, "total": 1, "summary": summary}
+        except Exception as e:
+            logging.error(f"Error in summarize_news: {str(e)}")
+            trace["error"] = True
+            yield {"stage": "error", "level": 0, "window": 0, "total": 0, "summary": None}
+
+def generate_search_query_with_gpt(summary, count=SEARCH_QUERY_VARIANTS):
+    # 한 번의 호출로 관점이 다른 질의 여러 개를 받아 검색 범위를 넓힘 (첫 줄이 대표 질의)
     return gpt_request(
-        prompt=f"Generated Summary: {summary}. Generate a short search query for Google.",
+        prompt=(
+            f"Generated Summary: {summary}. Generate {count} short search queries for Google, "
+            "each from a different angle. Write one query per line without numbering."
+        ),
         system_message="You are a helpful assistant that generates search queries based on summaries.",
-        max_tokens=100
+        max_tokens=40 * count,
+        purpose="search_query"
     )
 
+def parse_search_queries(content, count=SEARCH_QUERY_VARIANTS):
+    queries = []
+    for line in content.splitlines():
+        query = re.sub(r'^\s*(?:[-*•]|\d+[.)])\s*', '', line).strip().strip('"\'')
+        if query and query not in queries:
+            queries.append(query)
+    return queries[:count]
+
 def search_google_scholar(query):
     return search_request(
         url=SERP_API_URL,
         params={
             'engine': 'google_scholar',
             'q': query,
-            'api_key': SERP_API_KEY,
+            'api_key': get_api_key('SERP_API_KEY'),
             'num': 5
         },
-        error_message="Failed to fetch results from Google Scholar"
+        error_message="Failed to fetch results from Google Scholar",
+        backend="google_scholar"
     )
 
 def search_naver_news(query):
     headers = {
-        'X-Naver-Client-Id': NAVER_CLIENT_ID,
-        'X-Naver-Client-Secret': NAVER_CLIENT_SECRET
+        'X-Naver-Client-Id': get_api_key('NAVER_CLIENT_ID'),
+        'X-Naver-Client-Secret': get_api_key('NAVER_CLIENT_SECRET')
     }
     params = {
         'query': query,
@@ -79,7 +112,8 @@ def search_naver_news(query):
         url=NAVER_API_URL,
         headers=headers,
         params=params,
-        error_message="Failed to fetch results from Naver News"
+        error_message="Failed to fetch results from Naver News",
+        backend="naver_news"
     )
 
 def search_google(query):
@@ -88,10 +122,11 @@ def search_google(query):
         params={
             'engine': 'google',
             'q': query,
-            'api_key': SERP_API_KEY,
+            'api_key': get_api_key('SERP_API_KEY'),
             'num': 2
         },
-        error_message="Failed to fetch results from Google"
+        error_message="Failed to fetch results from Google",
+        backend="google"
     )
 
 def search_naver(query):
@@ -100,112 +135,231 @@ def search_naver(query):
         params={
             'engine': 'naver',
             'query': query,
-            'api_key': SERP_API_KEY,
+            'api_key': get_api_key('SERP_API_KEY'),
             'num': 2
         },
-        error_message="Failed to fetch results from Naver"
+        error_message="Failed to fetch results from Naver",
+        backend="naver"
     )
 
-def search_combined(query):
-    google_scholar_results = search_google_scholar(query)
-    naver_news_results = search_naver_news(query)
-    google_results = search_google(query)
-    naver_search_results = search_naver(query)
-    return google_scholar_results, naver_news_results, google_results, naver_search_results
-
-def analyze_with_gpt(summary, combined_content):
-    return gpt_request(
+def analysis_request(summary, combined_content):
+    return dict(
         prompt=(
             f"다음은 기사 요약입니다: {summary}\n\n"
             f"다음은 검색 결과입니다:\n{combined_content}\n\n"
             "이 정보를 바탕으로 간단한 분석을 제공하고, 정량적 사실을 3가지 리스트업 해주세요."
         ),
         system_message="You are a helpful assistant that provides a brief analysis based on summaries and search results.",
-        max_tokens=500
+        max_tokens=500,
+        purpose="analysis"
     )
 
+def analyze_with_gpt(summary, combined_content):
+    return gpt_request(**analysis_request(summary, combined_content))
+
+def analyze_with_gpt_stream(summary, combined_content):
+    return gpt_request_stream(**analysis_request(summary, combined_content))
+
 def classify_steep_with_gpt(summary):
     return gpt_request(
         prompt=f"Generated Summary: \"{summary}\". Based on the above news summary, determine whether it falls under Social, Technological, Economic, Environmental, or Political (STEEP). Respond with only the category name in title case (e.g., Economic).",
         system_message="You are a helpful assistant that classifies news summaries into STEEP categories.",
-        max_tokens=20
+        max_tokens=20,
+        purpose="classify_steep"
     )
 
 def extract_and_explain_keywords(summary):
     keyword_extraction = gpt_request(
         prompt=f"다음은 기사 요약입니다: \"{summary}\". 위 요약에서 한두 개의 핵심 기술 또는 전문 용어를 추출하고, 각 용어에 대한 간략한 설명을 제공해 주세요.",
         system_message="당신은 요약에서 핵심 기술 용어를 추출하고 설명을 제공하는 유용한 도우미입니다.",
-        max_tokens=200
+        max_tokens=200,
+        purpose="keywords"
     )
     if 'choices' in keyword_extraction and len(keyword_extraction['choices']) > 0:
         return keyword_extraction['choices'][0]['message']['content']
     else:
         return "핵심 키워드를 추출할 수 없습니다."
 
-def gpt_request(prompt, system_message, max_tokens):
-    headers = {
-        'Content-Type': 'application/json',
-        'Authorization': f'Bearer {GPT_API_KEY}'
-    }
-    data = {
-        'model': 'gpt-4o',
-        'messages': [
-            {"role": "system", "content": system_message},
-            {"role": "user", "content": prompt}
-        ],
-        'max_tokens': max_tokens
-    }
-    try:
-        response = requests.post('https://api.openai.com/v1/chat/completions', headers=headers, json=data, timeout=100)
-        return response.json()
-    except (requests.exceptions.JSONDecodeError, requests.exceptions.RequestException) as e:
-        logging.error(f"Error in gpt_request: {str(e)}")
-        return {"error": f"Failed to fetch response from GPT API: {str(e)}"}
+def gpt_request(prompt, system_message, max_tokens, purpose="chat"):
+    with stage(f"gpt:{purpose}", max_tokens=max_tokens) as trace:
+        # 동일한 (모델, 시스템 메시지, 프롬프트, max_tokens) 조합은 캐시된 응답 재사용
+        cache = get_response_cache()
+        cache_key = make_key('gpt', GPT_MODEL, system_message, prompt, max_tokens)
+        cached = cache.get(cache_key)
+        trace["cache_hit"] = cached is not None
+        if cached is not None:
+            return cached
 
-def search_request(url, params, headers=None, error_message="Failed to fetch search results"):
+        data = {
+            'model': GPT_MODEL,
+            'messages': [
+                {"role": "system", "content": system_message},
+                {"role": "user", "content": prompt}
+            ],
+            'max_tokens': max_tokens
+        }
+        limiter = get_limiter("openai")
+        cost = gpt_cost(prompt, system_message, max_tokens)
+        try:
+            headers = {
+                'Content-Type': 'application/json',
+                'Authorization': f"Bearer {get_api_key('GPT4_API_KEY')}"
+            }
+            response = http_client.post(GPT_API_URL, headers=headers, json=data, timeout=100, limiter=limiter, cost=cost)
+            trace["bytes"] = len(response.content)
+            result = response.json()
+            usage = result.get('usage') or {}
+            trace["prompt_tokens"] = usage.get('prompt_tokens')
+            trace["completion_tokens"] = usage.get('completion_tokens')
+            # 실패한 요청(choices 없음)은 토큰을 쓰지 않았으므로 예상치를 모두 돌려줌
+            limiter.settle("tokens", cost["tokens"], usage.get('total_tokens', None if 'choices' in result else 0))
+            if 'choices' in result:
+                cache.set(cache_key, result)
+            return result
+        except (ValueError, httpx.HTTPError) as e:
+            logging.error(f"Error in gpt_request: {str(e)}")
+            if isinstance(e, httpx.HTTPError):
+                limiter.settle("tokens", cost["tokens"], 0)
+            trace["error"] = True
+            return {"error": f"Failed to fetch response from GPT API: {str(e)}"}
+
+def api_error_message(response):
+    # 오류 본문이 JSON이 아니거나 error가 문자열이어도 메시지를 만들어 냄
     try:
-        response = requests.get(url, params=params, headers=headers, timeout=100)
-        response.raise_for_status()
-        return response.json()
-    except (requests.exceptions.JSONDecodeError, requests.exceptions.RequestException) as e:
-        logging.error(f"{error_message}: {str(e)}")
-        return {"error": f"{error_message}: {str(e)}"}
+        body = response.json()
+    except ValueError:
+        body = None
+    error = body.get('error') if isinstance(body, dict) else None
+    if isinstance(error, dict):
+        error = error.get('message')
+    return error if isinstance(error, str) and error else f"HTTP {response.status_code}"
+
+def gpt_request_stream(prompt, system_message, max_tokens, purpose="chat"):
+    with stage(f"gpt_stream:{purpose}", max_tokens=max_tokens) as trace:
+        started = time.perf_counter()
+        # stream: true로 요청해 SSE로 도착하는 토큰 조각을 바로 내보냄
+        cache = get_response_cache()
+        cache_key = make_key('gpt', GPT_MODEL, system_message, prompt, max_tokens)
+        cached = cache.get(cache_key)
+        trace["cache_hit"] = cached is not None
+        if cached is not None:
+            yield cached['choices'][0]['message']['content']
+            return
+
+        data = {
+            'model': GPT_MODEL,
+            'messages': [
+                {"role": "system", "content": system_message},
+                {"role": "user", "content": prompt}
+            ],
+            'max_tokens': max_tokens,
+            'stream': True,
+            # 마지막 조각으로 사용량을 받아 토큰 한도를 정산
+            'stream_options': {'include_usage': True}
+        }
+        parts = []
+        usage = None
+        completed = False
+        received_bytes = 0
+        limiter = get_limiter("openai")
+        cost = gpt_cost(prompt, system_message, max_tokens)
+        try:
+            headers = {
+                'Content-Type': 'application/json',
+                'Authorization': f"Bearer {get_api_key('GPT4_API_KEY')}"
+            }
+            with http_client.stream('POST', GPT_API_URL, headers=headers, json=data, timeout=100, limiter=limiter, cost=cost) as response:
+                if response.status_code != 200:
+                    response.read()
+                    raise ValueError(api_error_message(response))
+                for line in response.iter_lines():
+                    received_bytes += len(line) + 1
+                    if not line.startswith('data:'):
+                        continue
+                    payload = line[len('data:'):].strip()
+                    if payload == '[DONE]':
+                        completed = True
+                        break
+                    chunk = json.loads(payload)
+                    if chunk.get('usage'):
+                        usage = chunk['usage']
+                    if not chunk.get('choices'):
+                        continue
+                    delta = chunk['choices'][0].get('delta', {}).get('content')
+                    if delta:
+                        if not parts:
+                            trace["ttft"] = round(time.perf_counter() - started, 4)
+                        parts.append(delta)
+                        yield delta
+        except (ValueError, httpx.HTTPError) as e:
+            logging.error(f"Error in gpt_request_stream: {str(e)}")
+            raise RuntimeError(f"Failed to fetch response from GPT API: {str(e)}") from e
+        finally:
+            trace["bytes"] = received_bytes
+            trace["chunks"] = len(parts)
+            # 사용량 조각을 받지 못했으면(중단, 오류) 받은 만큼을 세어 정산
+            if usage is not None:
+                actual = usage.get('total_tokens')
+            else:
+                actual = cost["tokens"] - max_tokens + count_tokens("".join(parts))
+            limiter.settle("tokens", cost["tokens"], actual)
+        # 스트리밍으로 받은 응답도 일반 요청과 같은 키로 캐시 ([DONE]까지 받은 비어 있지 않은 응답만)
+        if completed and parts:
+            cache.set(cache_key, {"choices": [{"message": {"role": "assistant", "content": "".join(parts)}}]})
+
+def search_request(url, params, headers=None, error_message="Failed to fetch search results", backend="search"):
+    with stage(f"search:{backend}") as trace:
+        # 검색 결과는 시간이 지나면 바뀌므로 TTL을 두고 캐시 (API 키는 키에서 제외)
+        cache = get_response_cache()
+        cache_key = make_key('search', url, {k: v for k, v in params.items() if k != 'api_key'})
+        cached = cache.get(cache_key)
+        trace["cache_hit"] = cached is not None
+        if cached is not None:
+            return cached
+
+        try:
+            response = http_client.get(url, params=params, headers=headers, timeout=100, limiter=get_limiter(search_provider(url)))
+            trace["bytes"] = len(response.content)
+            response.raise_for_status()
+            result = response.json()
+            cache.set(cache_key, result, ttl=SEARCH_CACHE_TTL)
+            return result
+        except (ValueError, httpx.HTTPError) as e:
+            logging.error(f"{error_message}: {str(e)}")
+            trace["error"] = True
+            return {"error": f"{error_message}: {str(e)}"}
 
 def select_related_company(summary):
     return gpt_request(
         prompt=f"Based on the following news summary: \"{summary}\", provide only the stock ticker symbol of the most relevant company. Respond with only the ticker symbol.",
         system_message="You are a helpful assistant that selects the most relevant company's stock ticker symbol based on the news summary.",
-        max_tokens=10  # Stock ticker
+        max_tokens=10,  # Stock ticker
+        purpose="ticker"
     )
 
-def process_text_and_store_vectors(text, source_name):
+def process_text_and_store_vectors(text, source_name, progress=None):
     try:
-        document_id = f"doc_{source_name}"
-        collection.add(
-            documents=[text],
-            metadatas=[{"source": source_name}],
-            ids=[document_id]
-        )
-        return document_id
+        return ingest_text(get_collection(), text, source_name, progress=progress)
     except Exception as e:
         logging.error(f"Error in process_text_and_store_vectors: {str(e)}")
         raise e
 
-def generate_rag_report(summary):
+def rag_report_request(summary, source=None):
+    # 상위 k개 청크를 가져와 중복 제거/재정렬 후 토큰 예산 안에서 문맥 구성
+    chunks = retrieve_chunks(get_collection(), summary, source=source)
+    combined_text = summary + "\n\n" + build_context(chunks)
+
+    return dict(
+        prompt=f"Based on the following summary and related content, provide a detailed report: {combined_text}",
+        system_message="You are a helpful assistant that generates a detailed report based on summary and related documents.",
+        max_tokens=1000,
+        purpose="rag_report"
+    )
+
+def generate_rag_report(summary, source=None):
     try:
-        results = collection.query(
-            query_texts=[summary],
-            n_results=5
-        )
-        
-        combined_text = summary + "\n\n" + "\n\n".join([result['documents'][0] for result in results['documents']])
-        
-        rag_report_response = gpt_request(
-            prompt=f"Based on the following summary and related content, provide a detailed report: {combined_text}",
-            system_message="You are a helpful assistant that generates a detailed report based on summary and related documents.",
-            max_tokens=1000
-        )
-        
+        rag_report_response = gpt_request(**rag_report_request(summary, source))
+
         if 'choices' in rag_report_response and len(rag_report_response['choices']) > 0:
             return rag_report_response['choices'][0]['message']['content']
         else:
@@ -214,16 +368,18 @@ def generate_rag_report(summary):
         logging.error(f"Error in generate_rag_report: {str(e)}")
         raise e
 
-def process_pdf_and_store_vectors(pdf_file):
+def generate_rag_report_stream(summary, source=None):
+    try:
+        request = rag_report_request(summary, source)
+    except Exception as e:
+        logging.error(f"Error in generate_rag_report_stream: {str(e)}")
+        raise e
+    return gpt_request_stream(**request)
+
+def process_pdf_and_store_vectors(pdf_file, progress=None):
     try:
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        all_text = ""
-        for page_num in range(len(pdf_reader.pages)):
-            page = pdf_reader.pages[page_num]
-            all_text += page.extract_text()
-        
-        document_id = process_text_and_store_vectors(all_text, pdf_file.name)
-        return all_text
+        # 페이지 단위로 스트리밍하며 청크로 나눠 배치 저장 (이미 저장된 청크는 건너뜀)
+        return ingest_pdf(get_collection(), pdf_file, pdf_file.name, progress=progress)
     except Exception as e:
         logging.error(f"Error in process_pdf_and_store_vectors: {str(e)}")
         raise e
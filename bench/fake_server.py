@@ -0,0 +1,180 @@
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+# OpenAI / SerpAPI / Naver 검색 API를 흉내 내는 로컬 대역 서버
+# 녹화해 둔 응답(fixtures/)을 지연 시간과 오류 주입을 더해 그대로 돌려줌
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURE_DIR, name), encoding='utf-8') as f:
+        return json.load(f)
+
+class FakeApiConfig:
+    def __init__(self, latency_ms=50.0, jitter_ms=20.0, error_rate=0.0, stream_chunk_ms=5.0, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.stream_chunk_ms = stream_chunk_ms
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.openai = load_fixture("openai_chat.json")
+        self.search = {
+            "google_scholar": load_fixture("serpapi_google_scholar.json"),
+            "google": load_fixture("serpapi_google.json"),
+            "naver": load_fixture("serpapi_naver.json")
+        }
+        self.naver_news = load_fixture("naver_news.json")
+
+    def delay(self):
+        with self.lock:
+            value = max(0.0, self.random.gauss(self.latency_ms, self.jitter_ms))
+        time.sleep(value / 1000)
+
+    def should_fail(self):
+        with self.lock:
+            self.requests += 1
+            failed = self.random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+            return failed
+
+    def chat_content(self, messages):
+        system_message = next((message["content"] for message in messages if message["role"] == "system"), "")
+        for rule in self.openai["rules"]:
+            if rule["match"] in system_message:
+                return rule["content"]
+        return self.openai["default"]
+
+class FakeApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def inject_error(self):
+        if not self.config.should_fail():
+            return False
+        if self.config.random.random() < 0.5:
+            self.send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit"}}, {"Retry-After": "1"})
+        else:
+            self.send_json(500, {"error": {"message": "Internal server error", "type": "server_error"}})
+        return True
+
+    def do_GET(self):
+        self.config.delay()
+        if self.inject_error():
+            return
+        url = urlsplit(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if url.path.endswith("/search.json"):
+            payload = self.config.search.get(params.get("engine", "google"))
+            if payload is None:
+                self.send_json(400, {"error": f"Unsupported engine: {params.get('engine')}"})
+            else:
+                self.send_json(200, payload)
+        elif url.path.endswith("/news.json"):
+            self.send_json(200, self.config.naver_news)
+        else:
+            self.send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        self.config.delay()
+        if self.inject_error():
+            return
+        if not self.path.endswith("/chat/completions"):
+            self.send_json(404, {"error": {"message": "Not found"}})
+            return
+        content = self.config.chat_content(request.get("messages", []))
+        prompt_tokens = sum(len(message["content"]) for message in request.get("messages", [])) // 2
+        completion_tokens = len(content) // 2
+        if request.get("stream"):
+            self.stream_chat(content, request, prompt_tokens, completion_tokens)
+            return
+        self.send_json(200, {
+            "id": "chatcmpl-bench",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": self.config.openai["model"],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+        })
+
+    def stream_chat(self, content, request, prompt_tokens, completion_tokens):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def write_event(payload):
+            data = f"data: {payload}\n\n".encode('utf-8')
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        for start in range(0, len(content), 8):
+            chunk = {
+                "id": "chatcmpl-bench",
+                "object": "chat.completion.chunk",
+                "model": self.config.openai["model"],
+                "choices": [{"index": 0, "delta": {"content": content[start:start + 8]}, "finish_reason": None}]
+            }
+            write_event(json.dumps(chunk, ensure_ascii=False))
+            time.sleep(self.config.stream_chunk_ms / 1000)
+        if (request.get("stream_options") or {}).get("include_usage"):
+            # OpenAI와 같이 choices가 빈 마지막 조각으로 사용량 전달
+            write_event(json.dumps({
+                "id": "chatcmpl-bench", "object": "chat.completion.chunk", "model": self.config.openai["model"], "choices": [],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+            }))
+        write_event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+def start_server(config, host="127.0.0.1", port=0):
+    handler = type("ConfiguredFakeApiHandler", (FakeApiHandler,), {"config": config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="fake-api", daemon=True)
+    thread.start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI/SerpAPI/Naver 로컬 대역 서버")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    server = start_server(FakeApiConfig(args.latency_ms, args.jitter_ms, args.error_rate), port=args.port)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"OPENAI_API_BASE={base}/v1")
+    print(f"SERP_API_URL={base}/search.json")
+    print(f"NAVER_API_URL={base}/v1/search/news.json")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
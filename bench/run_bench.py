@@ -0,0 +1,249 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+# 네트워크 없이 요약/파이프라인/PDF 적재/시장 데이터의 처리량과 지연 시간을 측정
+# 사용 예: python bench/run_bench.py --scenarios summarizer,pipeline --concurrency 1,4,8 --output bench_output.json
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(os.path.dirname(BENCH_DIR), "app")
+CORPUS_PATH = os.path.join(BENCH_DIR, "corpus.jsonl")
+SCENARIOS = ("summarizer", "pipeline", "pdf_ingest", "market")
+
+sys.path.insert(0, BENCH_DIR)
+from fake_server import FakeApiConfig, start_server
+
+def load_corpus(path=CORPUS_PATH):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def configure_environment(base_url, work_dir, warm_cache):
+    # app 모듈은 import 시점에 환경 변수를 읽으므로 import 전에 설정해야 함
+    os.environ.update({
+        "OPENAI_API_BASE": f"{base_url}/v1",
+        "SERP_API_URL": f"{base_url}/search.json",
+        "NAVER_API_URL": f"{base_url}/v1/search/news.json",
+        "GPT4_API_KEY": "bench",
+        "SERP_API_KEY": "bench",
+        "NAVER_CLIENT_ID": "bench",
+        "NAVER_CLIENT_SECRET": "bench",
+        "RESPONSE_CACHE_ENABLED": "1" if warm_cache else "0",
+        "RESPONSE_CACHE_PATH": os.path.join(work_dir, "response_cache.sqlite3"),
+        "MARKET_DATA_DIR": os.path.join(work_dir, "market"),
+        "CHROMA_PERSIST_DIRECTORY": os.path.join(work_dir, "chroma"),
+        "EMBEDDING_CACHE_PATH": os.path.join(work_dir, "embedding_cache.sqlite3"),
+        "DEDUP_INDEX_PATH": os.path.join(work_dir, "dedup_index.sqlite3"),
+        "RATE_LIMIT_PATH": os.path.join(work_dir, "rate_limit.sqlite3")
+    })
+    # 반복 실행이 중복 기사로 처리되거나 제공자 한도에 묶이지 않도록 (명시적으로 지정하면 그 값을 사용)
+    for name, value in {"DEDUP_ENABLED": "0", "OPENAI_RPM": "100000", "OPENAI_TPM": "100000000", "SERPAPI_RPS": "1000", "NAVER_RPS": "1000"}.items():
+        os.environ.setdefault(name, value)
+    sys.path.insert(0, APP_DIR)
+
+class FakeTicker:
+    # yf.Ticker 대역: 고정된 데이터를 약간의 지연 후 돌려줌
+    def __init__(self, ticker, latency_ms):
+        self.ticker = ticker
+        self.latency = latency_ms / 1000
+
+    def _wait(self):
+        time.sleep(self.latency)
+
+    @property
+    def info(self):
+        self._wait()
+        return {"symbol": self.ticker, "longName": "Bench Corp", "currentPrice": 71000, "marketCap": 423_000_000_000_000}
+
+    @property
+    def recommendations(self):
+        import pandas as pd
+        self._wait()
+        return pd.DataFrame({"period": ["0m", "-1m"], "strongBuy": [10, 9], "buy": [20, 21], "hold": [5, 5], "sell": [0, 1], "strongSell": [0, 0]})
+
+    @property
+    def news(self):
+        self._wait()
+        return [{"title": "Bench Corp 3분기 실적 발표", "link": "https://example.com/news/1"}]
+
+    def history(self, period=None, start=None):
+        import numpy as np
+        import pandas as pd
+        self._wait()
+        index = pd.date_range(end=pd.Timestamp.today().normalize(), periods=5000, freq="B")
+        if start is not None:
+            index = index[index >= pd.Timestamp(start)]
+        close = 50000 + np.cumsum(np.random.default_rng(0).normal(0, 300, len(index)))
+        return pd.DataFrame({"Open": close, "High": close * 1.01, "Low": close * 0.99, "Close": close, "Volume": 1_000_000}, index=index)
+
+    def _statement(self):
+        import pandas as pd
+        self._wait()
+        return pd.DataFrame({"2023": [1.0, 2.0], "2024": [1.5, 2.5]}, index=["Total Revenue", "Net Income"])
+
+    financials = property(_statement)
+    balance_sheet = property(_statement)
+    cashflow = property(_statement)
+
+def build_pdf(corpus, path, pages):
+    import fitz
+    document = fitz.open()
+    for page_num in range(pages):
+        article = corpus[page_num % len(corpus)]
+        page = document.new_page()
+        page.insert_textbox(page.rect + (50, 50, -50, -50), f"{article['title']}\n\n{article['body']}", fontname="korea", fontsize=10)
+    document.save(path)
+    document.close()
+
+def make_scenario(name, corpus, args, work_dir):
+    if name == "summarizer":
+        from utils import summarize_news
+        return [article["body"] for article in corpus], summarize_news
+    if name == "pipeline":
+        from utils import summarize_news
+        from pipeline import run_research_pipeline
+
+        def run_pipeline(article):
+            # --skip-summarizer면 미리 만든 요약을 써서 외부 API 구간만 측정
+            summary = article["summary"] if args.skip_summarizer else summarize_news(article["body"])
+            result = run_research_pipeline(summary)
+            if "error" in result:
+                raise RuntimeError(result["error"])
+            return result
+        return corpus, run_pipeline
+    if name == "pdf_ingest":
+        from resources import get_collection
+        from ingest import ingest_pdf
+        path = args.pdf or os.path.join(work_dir, "bench.pdf")
+        if not args.pdf:
+            build_pdf(corpus, path, args.pdf_pages)
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        def run_ingest(index):
+            import io
+            # 실행마다 출처 이름을 달리해 중복 건너뛰기 없이 매번 적재
+            return ingest_pdf(get_collection(), io.BytesIO(data), f"bench-{time.time_ns()}-{index}")
+        return list(range(len(corpus))), run_ingest
+    if name == "market":
+        import market_data
+        market_data.set_ticker_factory(lambda ticker: FakeTicker(ticker, args.latency_ms))
+        return [f"BENCH{i}.KS" for i in range(len(corpus))], market_data.get_market_report
+    raise ValueError(f"Unknown scenario: {name}")
+
+def run_level(items, fn, concurrency, requests):
+    from tracing import start_run, percentile
+
+    def timed(item):
+        with start_run("bench") as run:
+            started = time.perf_counter()
+            try:
+                fn(item)
+                error = None
+            except Exception as e:
+                error = {"type": type(e).__name__, "message": str(e)}
+            return time.perf_counter() - started, error, run.timeline()
+
+    work = [items[i % len(items)] for i in range(requests)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bench") as executor:
+        results = list(executor.map(timed, work))
+    wall = time.perf_counter() - started
+
+    latencies = [latency for latency, _, _ in results]
+    errors = [error for _, error, _ in results if error is not None]
+    stages = defaultdict(list)
+    for _, _, timeline in results:
+        for entry in timeline:
+            stages[entry["stage"]].append(entry["duration"])
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": len(errors),
+        # 원인을 알 수 있도록 수준별 첫 번째 예외를 기록
+        "first_error": errors[0] if errors else None,
+        "wall_seconds": round(wall, 4),
+        "throughput_per_second": round(requests / wall, 3),
+        "p50": round(percentile(latencies, 0.5), 4),
+        "p95": round(percentile(latencies, 0.95), 4),
+        "stages": {
+            name: {"count": len(durations), "p50": round(percentile(durations, 0.5), 4), "p95": round(percentile(durations, 0.95), 4)}
+            for name, durations in sorted(stages.items())
+        }
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="오프라인 벤치마크")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"쉼표로 구분 ({', '.join(SCENARIOS)})")
+    parser.add_argument("--concurrency", default="1,4,8", help="쉼표로 구분한 동시 실행 수")
+    parser.add_argument("--requests", type=int, default=16, help="동시 실행 수마다 처리할 요청 수")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="대역 서버 평균 지연 시간")
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="429/500을 돌려줄 비율")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--warm-cache", action="store_true", help="응답 캐시를 켠 채로 측정")
+    parser.add_argument("--skip-summarizer", action="store_true", help="pipeline 시나리오에서 미리 만든 요약 사용")
+    parser.add_argument("--pdf", help="pdf_ingest에 사용할 PDF (없으면 말뭉치로 생성)")
+    parser.add_argument("--pdf-pages", type=int, default=40)
+    parser.add_argument("--parity", type=int, default=0, metavar="N",
+                        help="말뭉치 앞 N개로 설정된 요약 백엔드(SUMMARIZER_BACKEND)를 fp32 결과와 비교")
+    parser.add_argument("--output", help="결과 JSON 경로 (없으면 표준 출력)")
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    levels = [int(level) for level in args.concurrency.split(",")]
+    config = FakeApiConfig(args.latency_ms, args.jitter_ms, args.error_rate, seed=args.seed)
+    server = start_server(config)
+    corpus = load_corpus()
+
+    with tempfile.TemporaryDirectory(prefix="bench-") as work_dir:
+        configure_environment(f"http://127.0.0.1:{server.server_address[1]}", work_dir, args.warm_cache)
+        import http_client
+        from rate_limit import limiter_stats
+        from resources import warmup
+
+        # 모델 로딩 시간이 첫 측정에 섞이지 않도록 미리 적재
+        if set(scenarios) & {"summarizer", "pipeline", "pdf_ingest"}:
+            warmup()
+
+        report = {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "settings": {key: value for key, value in vars(args).items() if key != "output"},
+            "scenarios": {}
+        }
+        if args.parity:
+            from summarizer import check_backend_parity
+            report["parity"] = check_backend_parity([article["body"] for article in corpus[:args.parity]])
+        for name in scenarios:
+            items, fn = make_scenario(name, corpus, args, work_dir)
+            report["scenarios"][name] = [run_level(items, fn, level, args.requests) for level in levels]
+        report["fake_server"] = {"requests": config.requests, "injected_errors": config.errors}
+        report["http_pools"] = http_client.pool_stats()
+        report["rate_limits"] = limiter_stats()
+        http_client.close_all()
+    server.shutdown()
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
+
+    # 모든 요청이 실패한 시나리오가 있으면 측정값이 의미 없으므로 실패로 종료
+    failed = [
+        f"{name} (concurrency {level['concurrency']}): {level['first_error']['type']}: {level['first_error']['message']}"
+        for name, levels in report["scenarios"].items()
+        for level in levels
+        if level["requests"] and level["errors"] == level["requests"]
+    ]
+    if failed:
+        print("All requests failed in:\n  " + "\n  ".join(failed), file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+fitz = pytest.importorskip("fitz")
+pytest.importorskip("PyPDF2")
+
+import pdf_extract
+from ingest import ingest_pdf
+from pdf_extract import PyMuPdfBackend, PyPdf2Backend
+
+PAGES = 3
+
+class FakeCollection:
+    # Chroma 컬렉션 대역: get(ids)/add만 흉내 냄
+    def __init__(self):
+        self.documents = {}
+
+    def get(self, ids):
+        return {"ids": [id_ for id_ in ids if id_ in self.documents]}
+
+    def add(self, documents, metadatas, ids):
+        for id_, document, metadata in zip(ids, documents, metadatas):
+            self.documents[id_] = (document, metadata)
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    path = tmp_path / "sample.pdf"
+    document = fitz.open()
+    for page_num in range(1, PAGES + 1):
+        document.new_page().insert_text((72, 72), f"Sample page {page_num} about semiconductor exports")
+    document.save(path)
+    document.close()
+    return path
+
+@pytest.mark.parametrize("backend", [PyMuPdfBackend(), PyPdf2Backend()], ids=lambda backend: backend.name)
+@pytest.mark.parametrize("as_upload", [False, True], ids=["path", "bytesio"])
+def test_ingest_pdf(pdf_path, backend, as_upload):
+    pdf_file = io.BytesIO(pdf_path.read_bytes()) if as_upload else str(pdf_path)
+    collection = FakeCollection()
+    stats = ingest_pdf(collection, pdf_file, "sample", backend=backend)
+    assert stats["total_pages"] == PAGES
+    assert stats["added"] == PAGES
+    pages = sorted(metadata["page"] for _, metadata in collection.documents.values())
+    assert pages == list(range(1, PAGES + 1))
+    assert all("semiconductor" in document for document, _ in collection.documents.values())
+
+def test_ingest_pdf_parallel(pdf_path, monkeypatch):
+    # 작업 프로세스 경로: 메모리 내 업로드를 임시 파일로 넘겨 페이지 범위별로 추출
+    monkeypatch.setattr(pdf_extract, "PDF_WORKERS", 2)
+    backend = PyMuPdfBackend(parallel_min_pages=1, pages_per_task=1)
+    collection = FakeCollection()
+    stats = ingest_pdf(collection, io.BytesIO(pdf_path.read_bytes()), "sample", backend=backend)
+    assert stats["added"] == PAGES